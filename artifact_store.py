@@ -0,0 +1,238 @@
+"""
+Armazenamento das exportações por hash de conteúdo, com manifesto por domínio e retenção
+"""
+
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+from session_cache import atomic_write_json
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Metadados do xlsx que mudam a cada exportação mesmo com os mesmos dados
+_VOLATILE_MEMBERS = ("docProps/",)
+
+_COMPRESSORS = {"xz": (lzma.open, ".xz"), "gzip": (gzip.open, ".gz")}
+
+
+def content_digest(path):
+    """sha256 do conteúdo; para xlsx ignora datas de criação e a ordem do zip"""
+    digest = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.startswith(_VOLATILE_MEMBERS):
+                    continue
+                digest.update(name.encode("utf-8") + b"\0")
+                with archive.open(name) as member:
+                    for block in iter(lambda: member.read(1024 * 1024), b""):
+                        digest.update(block)
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _repack_stored(source, target):
+    """Regrava o zip sem compressão por membro: ainda é um xlsx válido e comprime melhor inteiro"""
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(target, "w", zipfile.ZIP_STORED) as dst:
+        for info in src.infolist():
+            with src.open(info) as member, dst.open(zipfile.ZipInfo(info.filename, info.date_time), "w") as out:
+                shutil.copyfileobj(member, out, 1024 * 1024)
+
+
+def _to_parquet(source, target):
+    """Converte a exportação (xlsx, csv ou jsonl do modo streaming) para parquet"""
+    extension = os.path.splitext(source)[1].lower()
+    if extension == ".parquet":
+        shutil.copyfile(source, target)
+        return
+    import pandas as pd
+
+    if extension in (".xlsx", ".xlsm"):
+        frame = pd.read_excel(source, engine="openpyxl")
+    elif extension == ".csv":
+        frame = pd.read_csv(source, encoding="utf-8-sig")
+    elif extension == ".jsonl":
+        frame = pd.read_json(source, lines=True)
+    else:
+        raise ValueError(f"Formato de exportação não suportado para parquet: {extension}")
+    frame.to_parquet(target, index=False)
+
+
+class ArtifactStore:
+    """objects/<hash> guarda cada conteúdo uma vez; manifests/<domínio>.json lista as versões"""
+
+    def __init__(self, root, compression=None, convert=None, keep_versions=10, max_age_days=90):
+        if compression not in (None, "xz", "gzip"):
+            raise ValueError(f"Compressão não suportada: {compression}")
+        if convert not in (None, "parquet"):
+            raise ValueError(f"Conversão não suportada: {convert}")
+        self.root = root
+        self.compression = compression
+        self.convert = convert
+        self.keep_versions = keep_versions
+        self.max_age_days = max_age_days
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+        self.work_dir = os.path.join(root, "work")
+        for directory in (self.objects_dir, self.manifests_dir, self.work_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def _manifest_path(self, domain):
+        return os.path.join(self.manifests_dir, f"{domain}.json")
+
+    def manifest(self, domain):
+        """Versões do domínio, da mais antiga para a mais recente"""
+        path = self._manifest_path(domain)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["versions"]
+
+    def _save_manifest(self, domain, versions):
+        atomic_write_json(self._manifest_path(domain), {"domain": domain, "versions": versions})
+
+    def _find_object(self, digest):
+        directory = os.path.join(self.objects_dir, digest[:2])
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                # Um .tmp é uma gravação interrompida, não o objeto
+                if name.startswith(digest) and not name.endswith(".tmp"):
+                    return os.path.join(directory, name)
+        return None
+
+    def put(self, domain, path):
+        """Move a exportação para o armazenamento e registra a versão
+
+        Retorna (versão, nova): nova é False quando o mesmo conteúdo já existia,
+        e nesse caso o arquivo recebido é apenas descartado.
+        """
+        digest = content_digest(path)
+        size = os.path.getsize(path)
+        existing = self._find_object(digest)
+        is_new = existing is None
+        if is_new:
+            existing = self._store_object(digest, path)
+        os.remove(path)
+
+        now = datetime.now().strftime(DATE_FORMAT)
+        versions = self.manifest(domain)
+        if versions and versions[-1]["sha256"] == digest:
+            # Recheck sem mudanças: só atualiza quando a versão foi vista pela última vez
+            version = versions[-1]
+            version["last_seen"] = now
+        else:
+            version = {
+                "sha256": digest,
+                "object": os.path.relpath(existing, self.root),
+                "original_name": os.path.basename(path),
+                "size": size,
+                "stored_size": os.path.getsize(existing),
+                "stored_at": now,
+                "last_seen": now,
+            }
+            versions.append(version)
+        self._save_manifest(domain, versions)
+        return version, is_new
+
+    def _store_object(self, digest, path):
+        directory = os.path.join(self.objects_dir, digest[:2])
+        os.makedirs(directory, exist_ok=True)
+        extension = os.path.splitext(path)[1]
+        fd, staging = tempfile.mkstemp(dir=self.work_dir)
+        os.close(fd)
+        try:
+            if self.convert == "parquet":
+                _to_parquet(path, staging)
+                extension = ".parquet"
+            elif self.compression and zipfile.is_zipfile(path):
+                _repack_stored(path, staging)
+            else:
+                shutil.copyfile(path, staging)
+
+            target = os.path.join(directory, digest + extension)
+            if self.compression:
+                opener, suffix = _COMPRESSORS[self.compression]
+                target += suffix
+                # Comprime em work/ e só então move: objects/ nunca tem um arquivo pela metade
+                fd, compressed = tempfile.mkstemp(dir=self.work_dir)
+                os.close(fd)
+                try:
+                    with open(staging, "rb") as src, opener(compressed, "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    os.replace(compressed, target)
+                finally:
+                    if os.path.exists(compressed):
+                        os.remove(compressed)
+            else:
+                os.replace(staging, target)
+            return target
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def open_path(self, version):
+        """Caminho legível da versão; descomprime para work/ quando necessário"""
+        path = os.path.join(self.root, version["object"])
+        for opener, suffix in _COMPRESSORS.values():
+            if path.endswith(suffix):
+                readable = os.path.join(self.work_dir, os.path.basename(path)[: -len(suffix)])
+                if not os.path.exists(readable):
+                    with opener(path, "rb") as src, open(readable + ".tmp", "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    os.replace(readable + ".tmp", readable)
+                return readable
+        return path
+
+    def reopen(self, path):
+        """Recria em work/ um arquivo que a limpeza apagou, pelo hash no nome; None se não for do armazenamento"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.work_dir):
+            return None
+        existing = self._find_object(os.path.basename(path).split(".", 1)[0])
+        if existing is None:
+            return None
+        return self.open_path({"object": os.path.relpath(existing, self.root)})
+
+    def apply_retention(self, now=None):
+        """Aplica o limite de versões e idade e apaga objetos sem referência"""
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self.max_age_days) if self.max_age_days else None
+        referenced = set()
+        removed_versions = 0
+
+        for name in os.listdir(self.manifests_dir):
+            if not name.endswith(".json"):
+                continue
+            domain = name[: -len(".json")]
+            versions = self.manifest(domain)
+            kept = versions[-self.keep_versions:] if self.keep_versions else versions
+            if cutoff:
+                # A versão mais recente sempre fica, mesmo se antiga
+                kept = [v for v in kept[:-1] if datetime.strptime(v["stored_at"], DATE_FORMAT) >= cutoff] + kept[-1:]
+            if len(kept) != len(versions):
+                removed_versions += len(versions) - len(kept)
+                self._save_manifest(domain, kept)
+            referenced.update(v["object"] for v in kept)
+
+        removed_objects = 0
+        freed = 0
+        for directory, _, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.path.relpath(path, self.root) not in referenced:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed_objects += 1
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+        return removed_versions, removed_objects, freed
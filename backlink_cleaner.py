@@ -0,0 +1,206 @@
+"""
+Limpador local de backlinks: extrai os domínios de referência de uma exportação
+"""
+
+import csv
+import hashlib
+import ipaddress
+import json
+import os
+import sys
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# Colunas que podem conter a URL de origem, já normalizadas (minúsculas, sem separadores)
+SOURCE_COLUMNS = ("sourceurl", "source", "urlfrom", "referringurl", "referringpage", "urldeorigem", "origem")
+
+# Sufixos públicos de dois níveis mais comuns, usados quando o tldextract não está instalado
+MULTI_LABEL_SUFFIXES = frozenset({
+    "com.br", "net.br", "org.br", "gov.br", "edu.br", "blog.br", "art.br", "eco.br", "ind.br", "inf.br",
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.jp", "ne.jp", "or.jp", "ac.jp",
+    "co.in", "net.in", "org.in", "co.nz", "org.nz", "co.za", "org.za",
+    "com.mx", "org.mx", "com.ar", "org.ar", "com.co", "com.pe", "com.ve", "com.uy", "com.py", "com.bo",
+    "com.cn", "net.cn", "org.cn", "com.hk", "com.tw", "com.sg", "com.my", "co.kr", "or.kr",
+    "com.tr", "com.ua", "com.pl", "com.es", "com.pt", "co.il", "co.id", "com.ph", "com.vn",
+    "github.io", "blogspot.com", "wordpress.com", "herokuapp.com", "vercel.app", "netlify.app",
+})
+
+try:
+    import tldextract
+    _extract = tldextract.TLDExtract(suffix_list_urls=())  # só a lista embutida, sem rede
+except ImportError:
+    _extract = None
+
+
+def _normalize_header(name):
+    return "".join(ch for ch in str(name or "").lower() if ch.isalnum())
+
+
+def find_source_column(header):
+    """Índice da coluna com a URL de origem"""
+    normalized = [_normalize_header(name) for name in header]
+    for candidate in SOURCE_COLUMNS:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    raise ValueError(f"Coluna de URL de origem não encontrada em: {list(header)}")
+
+
+def iter_rows(path):
+    """Lê a exportação em streaming, gerando o cabeçalho e depois cada linha"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+    elif extension == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.reader(f)
+    elif extension == ".jsonl":
+        header = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if header is None:
+                    header = list(record)
+                    yield header
+                yield [record.get(name) for name in header]
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        header = parquet.schema_arrow.names
+        yield header
+        for batch in parquet.iter_batches(batch_size=10000):
+            columns = [batch.column(name).to_pylist() for name in header]
+            yield from zip(*columns)
+    else:
+        raise ValueError(f"Formato de exportação não suportado: {extension}")
+
+
+def registrable_domain(url):
+    """Domínio registrável da URL: minúsculo, sem www, sem porta, sem subdomínios"""
+    if not url:
+        return None
+    url = str(url).strip()
+    if "//" not in url:
+        url = "//" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    return _host_domain(host.rstrip(".").lower())
+
+
+@lru_cache(maxsize=65536)
+def _host_domain(host):
+    """Parte cara da normalização, em cache porque os hosts se repetem muito"""
+    if host.startswith("www."):
+        host = host[4:]
+
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+
+    if _extract is not None:
+        parts = _extract(host)
+        if parts.domain and parts.suffix:
+            return f"{parts.domain}.{parts.suffix}"
+        return host or None
+
+    labels = host.split(".")
+    if len(labels) < 2:
+        return None
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _fingerprint(domain):
+    """Hash de 64 bits: o conjunto guarda inteiros, não as strings"""
+    return int.from_bytes(hashlib.blake2b(domain.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class _DomainWriter:
+    """Grava a lista limpa em txt, csv ou xlsx (modo write_only)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.extension = os.path.splitext(path)[1].lower()
+        if self.extension == ".xlsx":
+            from openpyxl import Workbook
+
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet("Dominios")
+            self._sheet.append(["Domínio"])
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+            if self.extension == ".csv":
+                self._file.write("Domínio\n")
+
+    def write(self, domain):
+        if self.extension == ".xlsx":
+            self._sheet.append([domain])
+        else:
+            self._file.write(domain + "\n")
+
+    def close(self):
+        if self.extension == ".xlsx":
+            self._workbook.save(self.path)
+        else:
+            self._file.close()
+
+
+def clean_backlinks(input_path, output_path, exclude=()):
+    """Extrai os domínios de referência únicos, na ordem em que aparecem
+
+    Retorna (linhas lidas, domínios únicos gravados).
+    """
+    rows = iter_rows(input_path)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ValueError(f"Arquivo vazio: {input_path}")
+    column = find_source_column(header)
+
+    seen = {_fingerprint(domain) for domain in exclude}
+    total = 0
+    unique = 0
+    writer = _DomainWriter(output_path)
+    try:
+        for row in rows:
+            total += 1
+            domain = registrable_domain(row[column] if column < len(row) else None)
+            if not domain:
+                continue
+            fingerprint = _fingerprint(domain)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            writer.write(domain)
+            unique += 1
+    finally:
+        writer.close()
+    return total, unique
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python backlink_cleaner.py <exportação> [saída.txt|.csv|.xlsx]")
+        sys.exit(1)
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) == 3 else os.path.splitext(source)[0] + "_limpo.txt"
+    read, written = clean_backlinks(source, target)
+    print(f"{read} linhas lidas, {written} domínios únicos gravados em {target}")
@@ -0,0 +1,165 @@
+"""
+Diferença de backlinks entre execuções, a partir das impressões digitais das linhas
+"""
+
+import csv
+import hashlib
+import sqlite3
+import threading
+import time
+
+from backlink_cleaner import find_source_column, iter_rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    domain TEXT NOT NULL,
+    fp INTEGER NOT NULL,
+    PRIMARY KEY (domain, fp)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deltas (
+    domain TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    total INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    lost INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deltas_domain ON deltas(domain, checked_at);
+"""
+
+# Colunas de destino, já normalizadas como em find_source_column
+TARGET_COLUMNS = ("targeturl", "target", "urlto")
+
+
+def row_fingerprint(source_url, target_url):
+    """Inteiro de 64 bits com sinal (cabe num INTEGER do SQLite)"""
+    key = f"{str(source_url or '').strip().lower()}\t{str(target_url or '').strip().lower()}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _find_target_column(header):
+    normalized = ["".join(ch for ch in str(name or "").lower() if ch.isalnum()) for name in header]
+    for candidate in TARGET_COLUMNS:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    return None
+
+
+class DeltaResult:
+    """Resumo da comparação de uma exportação com a anterior"""
+
+    def __init__(self, total, added, lost, delta_path, first_run):
+        self.total = total
+        self.added = added
+        self.lost = lost
+        self.delta_path = delta_path
+        self.first_run = first_run
+
+    @property
+    def change_ratio(self):
+        """Fração do perfil que mudou (novos + perdidos sobre o total)"""
+        base = max(self.total, 1)
+        return min(1.0, (self.added + self.lost) / base)
+
+
+class BacklinkIndex:
+    """Impressões digitais da última exportação de cada domínio
+
+    compute_delta só calcula a diferença; as impressões digitais mudam em
+    commit, chamado depois que limpeza, verificação e publicação deram certo.
+    Se um estágio falhar, a próxima tentativa vê as mesmas linhas como novas.
+    """
+
+    def __init__(self, path="backlink_fingerprints.db"):
+        self.path = path
+        # Chamado de threads (asyncio.to_thread); o lock serializa o acesso
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        # domínio → (novas, perdidas, total) calculadas e ainda não gravadas
+        self.pending = {}
+
+    def compute_delta(self, domain, export_path, delta_path):
+        """Compara a exportação com a anterior e grava só as linhas novas em delta_path (CSV)
+
+        Na primeira vez do domínio não há anterior: nada é gravado e delta_path
+        vem como None, pois a exportação inteira é a diferença. Nada muda no
+        índice até commit(domain).
+        """
+        with self.lock:
+            return self._compute_delta(domain, export_path, delta_path)
+
+    def _compute_delta(self, domain, export_path, delta_path):
+        previous = {row[0] for row in self.conn.execute("SELECT fp FROM fingerprints WHERE domain = ?", (domain,))}
+        first_run = not previous and not self.conn.execute(
+            "SELECT 1 FROM deltas WHERE domain = ? LIMIT 1", (domain,)
+        ).fetchone()
+
+        rows = iter_rows(export_path)
+        header = next(rows, None)
+        if header is None:
+            # Exportação vazia, sem nem o cabeçalho: nada novo, e nada é dado como perdido
+            self.pending[domain] = ([], set(), 0)
+            return DeltaResult(0, 0, 0, None, first_run)
+        header = list(header)
+        source_column = find_source_column(header)
+        target_column = _find_target_column(header)
+
+        current = set()
+        added = []
+        delta_file = None if first_run or delta_path is None else open(delta_path, "w", encoding="utf-8", newline="")
+        try:
+            writer = csv.writer(delta_file) if delta_file else None
+            if writer:
+                writer.writerow(header)
+            for row in rows:
+                source = row[source_column] if source_column < len(row) else None
+                if not source:
+                    continue
+                target = row[target_column] if target_column is not None and target_column < len(row) else None
+                fp = row_fingerprint(source, target)
+                if fp in current:
+                    continue
+                current.add(fp)
+                if fp not in previous:
+                    added.append(fp)
+                    if writer:
+                        writer.writerow(row)
+        finally:
+            if delta_file:
+                delta_file.close()
+
+        lost = previous - current
+        self.pending[domain] = (added, lost, len(current))
+        return DeltaResult(len(current), len(added), len(lost), None if first_run else delta_path, first_run)
+
+    def commit(self, domain, export_path):
+        """Grava as impressões digitais da exportação depois que os estágios seguintes terminaram
+
+        Sem diferença pendente (ex.: domínio retomado em outra execução), ela é
+        recalculada a partir da exportação, sem gravar CSV.
+        """
+        with self.lock:
+            if domain not in self.pending:
+                self._compute_delta(domain, export_path, None)
+            added, lost, total = self.pending.pop(domain)
+            # Só grava a diferença: perfis grandes mudam pouco entre execuções
+            with self.conn:
+                self.conn.executemany("DELETE FROM fingerprints WHERE domain = ? AND fp = ?", ((domain, fp) for fp in lost))
+                self.conn.executemany("INSERT INTO fingerprints (domain, fp) VALUES (?, ?)", ((domain, fp) for fp in added))
+                self.conn.execute(
+                    "INSERT INTO deltas (domain, checked_at, total, added, lost) VALUES (?, ?, ?, ?, ?)",
+                    (domain, time.time(), total, len(added), len(lost)),
+                )
+
+    def history(self, domain):
+        """Deltas registrados do domínio: (checked_at, total, added, lost)"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT checked_at, total, added, lost FROM deltas WHERE domain = ? ORDER BY checked_at", (domain,)
+            ).fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,296 @@
+"""
+Leitura dos backlinks direto das respostas JSON que preenchem a tabela do SEMrush
+"""
+
+import asyncio
+import csv
+import json
+import os
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Colunas normalizadas e os nomes que elas costumam ter no JSON
+ROW_FIELDS = {
+    "source_url": ("source_url", "sourceUrl", "url_from", "urlFrom", "source"),
+    "source_title": ("source_title", "sourceTitle", "title"),
+    "target_url": ("target_url", "targetUrl", "url_to", "urlTo", "target"),
+    "anchor": ("anchor", "anchor_text", "anchorText"),
+    "nofollow": ("nofollow", "noFollow", "is_nofollow"),
+    "first_seen": ("first_seen", "firstSeen"),
+    "last_seen": ("last_seen", "lastSeen"),
+    "page_ascore": ("page_ascore", "pageAscore", "page_score", "ascore"),
+}
+
+PAGE_KEYS = ("page", "pageNumber", "page_number")
+OFFSET_KEYS = ("offset", "display_offset", "start")
+LIMIT_KEYS = ("limit", "display_limit", "pageSize", "page_size", "per_page")
+
+_SKIPPED_HEADERS = {"host", "content-length", "cookie", "connection", "accept-encoding"}
+
+
+class JsonlSink:
+    """Uma linha JSON por backlink"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, row):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSink:
+    """CSV com as colunas normalizadas"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=list(ROW_FIELDS))
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """Parquet gravado em lotes para manter a memória limitada"""
+
+    def __init__(self, path, batch_size=5000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in ROW_FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch = []
+        self.batch_size = batch_size
+
+    def write(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        columns = {
+            name: [None if row[name] is None else str(row[name]) for row in self._batch]
+            for name in ROW_FIELDS
+        }
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+        self._batch = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "parquet": ParquetSink}
+
+
+def open_sink(path):
+    """Escolhe o sink pela extensão do arquivo"""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in SINKS:
+        raise ValueError(f"Formato de saída não suportado: {extension}")
+    return SINKS[extension](path)
+
+
+def normalize_row(raw):
+    """Mapeia um objeto do JSON para as colunas normalizadas"""
+    row = {}
+    for field, aliases in ROW_FIELDS.items():
+        row[field] = next((raw[key] for key in aliases if key in raw), None)
+    return row
+
+
+def extract_rows(payload):
+    """Procura a primeira lista de objetos que pareça uma lista de backlinks"""
+    source_keys = ROW_FIELDS["source_url"]
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            if node and isinstance(node[0], dict) and any(key in node[0] for key in source_keys):
+                return node
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
+        elif isinstance(node, dict):
+            stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+    return []
+
+
+def extract_total(payload):
+    """Total de backlinks informado pela resposta, se houver"""
+    if isinstance(payload, dict):
+        for key in ("total", "total_count", "totalCount", "count"):
+            if isinstance(payload.get(key), int):
+                return payload[key]
+        for value in payload.values():
+            total = extract_total(value)
+            if total is not None:
+                return total
+    return None
+
+
+class Paginator:
+    """Descobre o parâmetro de paginação da requisição e gera as próximas"""
+
+    def __init__(self, method, url, headers, body):
+        self.method = method
+        self.url = url
+        self.headers = {
+            name: value for name, value in headers.items()
+            if not name.startswith(":") and name.lower() not in _SKIPPED_HEADERS
+        }
+        # Corpo que não é JSON (formulário, JSON inválido) vai igual em todas as páginas
+        self.raw_body = body
+        self.body = self._parse_body(body)
+        self._query = dict(parse_qsl(urlsplit(url).query))
+        self.location, self.key, self.kind = self._detect()
+        self.limit = self._find_limit()
+
+    @staticmethod
+    def _parse_body(body):
+        """Corpo JSON da requisição; None se não for JSON válido"""
+        if not body or not body.lstrip().startswith(("{", "[")):
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def _params(self):
+        """Dicionários onde os parâmetros podem estar (query string e corpo JSON)"""
+        found = [("query", self._query)]
+        stack = [self.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                found.append(("body", node))
+                stack.extend(value for value in node.values() if isinstance(value, dict))
+            elif isinstance(node, list):
+                stack.extend(node)
+        return found
+
+    def _detect(self):
+        for location, params in self._params():
+            for key in PAGE_KEYS:
+                if key in params:
+                    return (location, params), key, "page"
+            for key in OFFSET_KEYS:
+                if key in params:
+                    return (location, params), key, "offset"
+        return None, None, None
+
+    def _find_limit(self):
+        for _, params in self._params():
+            for key in LIMIT_KEYS:
+                if key in params:
+                    try:
+                        return int(params[key])
+                    except (TypeError, ValueError):
+                        pass
+        return None
+
+    @property
+    def supported(self):
+        return self.key is not None
+
+    def advance(self, rows_in_page):
+        """Avança para a próxima página e retorna (url, corpo)"""
+        location, params = self.location
+        current = int(params[self.key])
+        step = 1 if self.kind == "page" else (self.limit or rows_in_page)
+        value = current + step
+        params[self.key] = str(value) if location == "query" else value
+
+        parts = urlsplit(self.url)
+        url = urlunsplit(parts._replace(query=urlencode(self._query)))
+        body = json.dumps(self.body) if self.body is not None else self.raw_body
+        return url, body
+
+
+class XhrCapture:
+    """Guarda a primeira resposta JSON da tabela de backlinks recebida pela página"""
+
+    def __init__(self, page, url_pattern):
+        self.page = page
+        self._pattern = re.compile(url_pattern, re.I)
+        self._future = asyncio.get_running_loop().create_future()
+        self._listening = False
+
+    def _on_response(self, response):
+        if self._future.done():
+            return
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if not self._pattern.search(response.url):
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        self._future.set_result(response)
+
+    def start(self):
+        self.page.on("response", self._on_response)
+        self._listening = True
+        return self
+
+    def stop(self):
+        if self._listening:
+            self.page.remove_listener("response", self._on_response)
+            self._listening = False
+
+    async def first_response(self, timeout):
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._future), timeout / 1000)
+        finally:
+            self.stop()
+
+
+async def stream_backlinks(page, capture, file_path, timeout=60000, max_pages=1000):
+    """Grava no sink as linhas da resposta capturada e das páginas seguintes"""
+    response = await capture.first_response(timeout)
+    payload = await response.json()
+    request = response.request
+
+    paginator = Paginator(request.method, request.url, await request.all_headers(), request.post_data)
+    total = extract_total(payload)
+    written = 0
+
+    sink = open_sink(file_path)
+    try:
+        for page_number in range(max_pages):
+            rows = extract_rows(payload)
+            for raw in rows:
+                sink.write(normalize_row(raw))
+            written += len(rows)
+
+            if not rows or not paginator.supported:
+                break
+            if total is not None and written >= total:
+                break
+            if paginator.limit and len(rows) < paginator.limit:
+                break
+
+            # O APIRequestContext do contexto compartilha os cookies da sessão
+            url, body = paginator.advance(len(rows))
+            next_response = await page.context.request.fetch(
+                url, method=paginator.method, headers=paginator.headers, data=body, timeout=timeout
+            )
+            if not next_response.ok:
+                raise Exception(f"Página {page_number + 2} de backlinks retornou HTTP {next_response.status}")
+            payload = await next_response.json()
+    finally:
+        sink.close()
+
+    if not paginator.supported:
+        print("Paginação não identificada na requisição, apenas a primeira página foi gravada")
+    print(f"{written} backlinks gravados em {file_path}")
+    return file_path
@@ -0,0 +1,113 @@
+"""
+Endpoint falso do upload retomável do Google Drive, para testar o DrivePublisher localmente
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeDrive:
+    """Guarda as sessões e os arquivos recebidos em memória"""
+
+    def __init__(self, fail_rate=0.0):
+        self.fail_rate = fail_rate
+        self.sessions = {}
+        self.files = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(drive):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body=None, headers=None):
+            payload = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(payload)))
+            if body is not None:
+                self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _maybe_fail(self):
+            with drive.lock:
+                drive.requests += 1
+            if drive.fail_rate and random.random() < drive.fail_rate:
+                self._body()
+                self._reply(503, {"error": "falha injetada"})
+                return True
+            return False
+
+        def do_POST(self):
+            if self._maybe_fail():
+                return
+            if not self.path.startswith("/upload/drive/v3/files"):
+                return self._reply(404, {"error": "not found"})
+            metadata = json.loads(self._body() or b"{}")
+            session_id = uuid.uuid4().hex
+            with drive.lock:
+                drive.sessions[session_id] = {
+                    "name": metadata.get("name"),
+                    "total": int(self.headers.get("X-Upload-Content-Length", 0)),
+                    "data": bytearray(),
+                }
+            host = self.headers.get("Host")
+            self._reply(200, headers={"Location": f"http://{host}/upload/session/{session_id}"})
+
+        def do_PUT(self):
+            if self._maybe_fail():
+                return
+            match = re.match(r"^/upload/session/(\w+)$", self.path)
+            session = drive.sessions.get(match.group(1)) if match else None
+            if session is None:
+                return self._reply(404, {"error": "sessão desconhecida"})
+
+            content_range = self.headers.get("Content-Range", "")
+            chunk = self._body()
+            with drive.lock:
+                received = len(session["data"])
+                ranged = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+                if ranged and int(ranged.group(1)) == received:
+                    session["data"].extend(chunk)
+                    received = len(session["data"])
+
+                if received >= session["total"]:
+                    file_id = match.group(1)
+                    drive.files[file_id] = {"name": session["name"], "data": bytes(session["data"])}
+                    return self._reply(200, {"id": file_id, "name": session["name"]})
+
+            headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+            self._reply(308, headers=headers)
+
+    return Handler
+
+
+def start_fake_drive(port=0, fail_rate=0.0):
+    """Sobe o servidor numa thread; retorna (servidor, estado, url base)"""
+    drive = FakeDrive(fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(drive))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, drive, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, _, url = start_fake_drive(port)
+    print(f"Drive falso em {url} (Ctrl+C para sair)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,239 @@
+"""
+Servidor falso do SEOPack/SEMrush: login, dashboard com o popup, relatório de backlinks e exportação xlsx
+"""
+
+import io
+import random
+import sys
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+from xml.sax.saxutils import escape
+
+LOGIN_PAGE = """<!doctype html>
+<html><body>
+<form method="post" action="/login">
+  <input type="text" name="usuario" placeholder="Seu usuario" class="form-control">
+  <input type="password" name="senha" class="form-control">
+  <button type="submit" class="btn-primary">Entrar</button>
+</form>
+</body></html>"""
+
+DASHBOARD_PAGE = """<!doctype html>
+<html><body>
+<h1>Dashboard</h1>
+<a href="/semrush" target="_blank">ACESS SEMRUSH 01</a>
+</body></html>"""
+
+SEMRUSH_PAGE = """<!doctype html><html><body>SEMrush conectado</body></html>"""
+
+BACKLINKS_PAGE = """<!doctype html>
+<html><body>
+<h1>Backlinks: {domain}</h1>
+<a data-test="backlinks-tab" href="#"
+   onclick="document.getElementById('panel').style.display='block'; return false;">Backlinks</a>
+<div id="panel" style="display:none">
+  <button onclick="document.getElementById('menu').style.display='block'">
+    <span data-ui-name="Button.Text">Export</span>
+  </button>
+  <button><span data-ui-name="Button.Text">Export to PDF</span></button>
+  <div id="menu" style="display:none">
+    <div data-ui-name="DropdownMenu.Item" data-test-export-type="csv">CSV</div>
+    <div data-ui-name="DropdownMenu.Item" data-test-export-type="xls"
+         onclick="window.location.href='/export?q={quoted}&type=xls'">Excel</div>
+  </div>
+</div>
+</body></html>"""
+
+COLUMNS = ("Page ascore", "Source title", "Source url", "Target url", "Anchor", "External links", "Internal links")
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Backlinks" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+
+def _cell(value):
+    if isinstance(value, int):
+        return f"<c t=\"n\"><v>{value}</v></c>"
+    return f"<c t=\"inlineStr\"><is><t>{escape(str(value))}</t></is></c>"
+
+
+def backlink_rows(domain, count, churn=0.0, version=0):
+    """Linhas determinísticas por domínio; churn troca essa fração das linhas a cada versão"""
+    rng = random.Random(f"{domain}:{version}")
+    rows = []
+    for index in range(count):
+        if churn and rng.random() < churn:
+            index = f"{version}-{index}"
+        checksum = zlib.crc32(str(index).encode())
+        referrer = f"ref{index}.site{checksum % 97}.com"
+        rows.append((
+            checksum % 100,
+            f"Post {index}",
+            f"https://{referrer}/post/{index}",
+            f"https://{domain}/",
+            f"âncora {index}",
+            5,
+            20,
+        ))
+    return rows
+
+
+def build_xlsx(rows):
+    """Planilha mínima com strings inline, legível pelo openpyxl"""
+    sheet = io.StringIO()
+    sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>')
+    sheet.write('<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    for row in [COLUMNS] + rows:
+        sheet.write("<row>" + "".join(_cell(value) for value in row) + "</row>")
+    sheet.write("</sheetData></worksheet>")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/worksheets/sheet1.xml", sheet.getvalue())
+    return buffer.getvalue()
+
+
+class MockSEOPack:
+    """Configuração das respostas e contadores das requisições recebidas"""
+
+    def __init__(self, rows=500, page_latency=0.0, export_latency=0.0, fail_rate=0.0, churn=0.0):
+        self.rows = rows
+        self.page_latency = page_latency
+        self.export_latency = export_latency
+        self.fail_rate = fail_rate
+        self.churn = churn
+        self.sessions = set()
+        self.exports = {}
+        self.requests = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with mock.lock:
+                mock.bytes_sent += len(body)
+
+        def _redirect(self, location, headers=None):
+            self._reply(302, headers={"Location": location, **(headers or {})})
+
+        def _logged_in(self):
+            cookies = self.headers.get("Cookie", "")
+            return any(part.strip().split("=", 1)[-1] in mock.sessions for part in cookies.split(";") if "session=" in part)
+
+        def do_GET(self):
+            with mock.lock:
+                mock.requests += 1
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path == "/login":
+                return self._reply(200, LOGIN_PAGE)
+            if not self._logged_in():
+                return self._redirect("/login")
+            if url.path == "/dashboard":
+                return self._reply(200, DASHBOARD_PAGE)
+            if url.path == "/semrush":
+                return self._reply(200, SEMRUSH_PAGE)
+            if url.path.startswith("/analytics/backlinks/backlinks"):
+                domain = query.get("q", [""])[0]
+                if mock.page_latency:
+                    time.sleep(mock.page_latency)
+                return self._reply(200, BACKLINKS_PAGE.format(domain=escape(domain), quoted=quote(domain)))
+            if url.path == "/export":
+                return self._export(query.get("q", [""])[0])
+            self._reply(404, "não encontrado")
+
+        def _export(self, domain):
+            if mock.export_latency:
+                time.sleep(mock.export_latency)
+            if mock.fail_rate and random.random() < mock.fail_rate:
+                with mock.lock:
+                    mock.failures += 1
+                return self._reply(random.choice((429, 503)), "<html><body>Too many requests</body></html>")
+            with mock.lock:
+                version = mock.exports.get(domain, 0)
+                mock.exports[domain] = version + 1
+            payload = build_xlsx(backlink_rows(domain, mock.rows, mock.churn, version if mock.churn else 0))
+            self._reply(
+                200,
+                payload,
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                {"Content-Disposition": f'attachment; filename="{domain}-backlinks.xlsx"'},
+            )
+
+        def do_POST(self):
+            with mock.lock:
+                mock.requests += 1
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("utf-8")) if length else {}
+            if urlparse(self.path).path != "/login":
+                return self._reply(404, "não encontrado")
+            if not form.get("usuario") or not form.get("senha"):
+                return self._redirect("/login")
+            session = uuid.uuid4().hex
+            with mock.lock:
+                mock.sessions.add(session)
+            self._redirect("/dashboard", {"Set-Cookie": f"session={session}; Path=/; Max-Age=86400"})
+
+    return Handler
+
+
+def start_mock_seopack(port=0, **options):
+    """Sobe o servidor numa thread; retorna (servidor, estado, url base)"""
+    mock = MockSEOPack(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(mock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, mock, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8766
+    server, _, url = start_mock_seopack(port)
+    print(f"SEOPack falso em {url}/login (Ctrl+C para sair)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
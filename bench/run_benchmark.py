@@ -0,0 +1,140 @@
+"""
+Benchmark do domain_checker.main() contra o servidor falso: domínios/min, latência por etapa e pico de RSS
+
+Uso: python bench/run_benchmark.py [domínios] [linhas_por_exportação] [latência_exportação_s] [taxa_de_falhas]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from browser_manager import rss_kb, tree_rss_kb
+
+
+class RssSampler:
+    """Amostra o RSS do Python e da árvore inteira (driver e Chromium inclusos)"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_self = 0
+        self.peak_tree = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            self.peak_self = max(self.peak_self, rss_kb(pid))
+            self.peak_tree = max(self.peak_tree, tree_rss_kb(pid))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def prepare_workdir(domains, base_url):
+    """Diretório temporário com domains.txt e um config.py apontando para o servidor falso"""
+    workdir = tempfile.mkdtemp(prefix="bench_backlinks_")
+    with open(os.path.join(workdir, "domains.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(domains) + "\n")
+    with open(os.path.join(workdir, "config.py"), "w", encoding="utf-8") as f:
+        f.write(
+            'SEOPACK_LOGIN = "benchmark"\n'
+            'SEOPACK_PASSWORD = "benchmark"\n'
+            f'SEOPACK_LOGIN_URL = "{base_url}/login"\n'
+            f'SEOPACK_DASHBOARD_URL = "{base_url}/dashboard"\n'
+        )
+    os.makedirs(os.path.join(workdir, "Google Drive"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "debug"), exist_ok=True)
+    return workdir
+
+
+def run_benchmark(domain_count=20, rows=500, export_latency=0.0, fail_rate=0.0, page_latency=0.0):
+    sys.path.insert(0, BENCH_DIR)
+    from mock_seopack import start_mock_seopack
+
+    server, mock, base_url = start_mock_seopack(
+        rows=rows, export_latency=export_latency, fail_rate=fail_rate, page_latency=page_latency
+    )
+    domains = [f"bench{index}.example.com" for index in range(domain_count)]
+    workdir = prepare_workdir(domains, base_url)
+
+    # Os caches do domain_checker são abertos na importação, relativos ao diretório atual
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    import domain_checker
+    from domain_verifier import StubResolver
+    from pipeline import percentile
+
+    # Só o necessário para rodar offline; o resto segue a configuração do repositório
+    domain_checker.SEMRUSH_BASE_URL = base_url
+    domain_checker.RUN_TIME_BUDGET = timedelta(hours=24)
+    domain_checker.DOWNLOAD_TIMEOUT = 20000
+    domain_checker.dns_resolver = StubResolver()
+    launch = domain_checker.launch
+    domain_checker.launch = lambda headless=False: launch(headless=True)
+
+    print(f"=== Benchmark: {domain_count} domínios, {rows} linhas, exportação +{export_latency}s, falhas {fail_rate:.0%} ===")
+    print(f"Servidor falso em {base_url}, diretório {workdir}")
+    sampler = RssSampler().start()
+    started = time.monotonic()
+    try:
+        asyncio.run(domain_checker.main())
+    finally:
+        elapsed = time.monotonic() - started
+        sampler.stop()
+        server.shutdown()
+
+    done = domain_checker.get_work_queue().counts().get("done", 0)
+    stages = {
+        name: {"n": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+        for name, values in domain_checker.instrumentation.durations.items()
+    }
+    result = {
+        "domains": domain_count,
+        "done": done,
+        "elapsed": round(elapsed, 2),
+        "domains_per_minute": round(done * 60 / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_python_mb": round(sampler.peak_self / 1024, 1),
+        "peak_rss_tree_mb": round(sampler.peak_tree / 1024, 1),
+        "mock_requests": mock.requests,
+        "mock_failures": mock.failures,
+        "mock_bytes": mock.bytes_sent,
+        "stages": stages,
+    }
+
+    print("\n=== Resultado do benchmark ===")
+    print(f"{done}/{domain_count} domínios em {elapsed:.1f}s ({result['domains_per_minute']:.2f}/min)")
+    print(f"Pico de RSS: {result['peak_rss_python_mb']} MB (Python), {result['peak_rss_tree_mb']} MB (com navegador)")
+    print(f"Servidor: {mock.requests} requisições, {mock.failures} falhas injetadas, {mock.bytes_sent} bytes")
+    for name, stats in sorted(stages.items(), key=lambda item: item[1]["p95"], reverse=True):
+        print(f"  {name:<26} n={stats['n']:<4} p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s")
+
+    with open(os.path.join(workdir, "benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {os.path.join(workdir, 'benchmark.json')}")
+    return result
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_benchmark(
+        domain_count=int(args[0]) if len(args) > 0 else 20,
+        rows=int(args[1]) if len(args) > 1 else 500,
+        export_latency=float(args[2]) if len(args) > 2 else 0.0,
+        fail_rate=float(args[3]) if len(args) > 3 else 0.0,
+    )
@@ -0,0 +1,313 @@
+"""
+Navegador de longa duração: conexão a um Chromium já aberto, reciclagem de páginas e contextos e encerramento limpo
+
+Uso (servidor persistente): python browser_manager.py [porta] [diretório_do_perfil] [--headless]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+
+def process_tree(root_pid):
+    """PIDs do processo e de todos os descendentes (Linux, via /proc)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # O nome do processo pode ter espaços; o ppid vem logo depois do ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree = [root_pid]
+    for pid in tree:
+        tree.extend(children.get(pid, []))
+    return tree
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def tree_rss_kb(root_pid):
+    """RSS somado do processo e dos descendentes; 0 fora do Linux"""
+    if not os.path.isdir("/proc"):
+        return 0
+    return sum(rss_kb(pid) for pid in process_tree(root_pid))
+
+
+def find_server_pid(port):
+    """PID do Chromium aberto com --remote-debugging-port=<porta>, se houver"""
+    marker = f"--remote-debugging-port={port}".encode()
+    if not os.path.isdir("/proc"):
+        return None
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                if marker in f.read().split(b"\0"):
+                    return int(entry)
+        except OSError:
+            continue
+    return None
+
+
+def spawn_browser_server(executable, port, user_data_dir=None, headless=False):
+    """Abre um Chromium com depuração remota numa sessão própria, para sobreviver ao processo atual"""
+    user_data_dir = user_data_dir or os.path.join(tempfile.gettempdir(), f"backlinks-chromium-{port}")
+    args = [
+        executable,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-dev-shm-usage",
+    ]
+    if headless:
+        args.append("--headless=new")
+    args.append("about:blank")
+    process = subprocess.Popen(
+        args,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return process.pid
+
+
+class BrowserManager:
+    """Entrega uma página por worker e recicla páginas e contextos sem perder a sessão
+
+    Uma página é trocada depois de recycle_pages_after domínios. O contexto
+    inteiro é trocado depois de recycle_context_after domínios ou quando o RSS
+    do navegador passa de rss_limit_mb: novos domínios esperam os que estão em
+    andamento terminarem, o estado da sessão é copiado para um contexto novo e
+    o antigo é fechado. Fechar o contexto nem sempre devolve a memória, então
+    depois de uma troca por RSS o gatilho só volta a valer quando o RSS cai
+    abaixo de rss_rearm_mb ou depois de rss_min_domains domínios.
+    """
+
+    def __init__(
+        self,
+        headless=False,
+        server_url=None,
+        spawn_server=True,
+        user_data_dir=None,
+        recycle_pages_after=25,
+        recycle_context_after=100,
+        rss_limit_mb=None,
+        rss_rearm_mb=None,
+        rss_min_domains=20,
+        context_factory=None,
+    ):
+        self.headless = headless
+        # Ex.: "http://127.0.0.1:9222"; None abre um navegador novo a cada execução
+        self.server_url = server_url
+        self.spawn_server = spawn_server
+        self.user_data_dir = user_data_dir
+        self.recycle_pages_after = recycle_pages_after
+        self.recycle_context_after = recycle_context_after
+        self.rss_limit_mb = rss_limit_mb
+        self.rss_rearm_mb = rss_rearm_mb if rss_rearm_mb is not None else (rss_limit_mb or 0) * 0.8
+        self.rss_min_domains = rss_min_domains
+        # async (browser, storage_state) -> contexto; por padrão browser.new_context
+        self.context_factory = context_factory
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.pages = []
+        self.connected = False
+        self.server_pid = None
+        self.page_recycles = 0
+        self.context_recycles = 0
+        self.peak_rss_kb = 0
+        self._page_uses = []
+        self._context_uses = 0
+        self._rss_armed = True
+        self._active = 0
+        self._draining = False
+        self._condition = asyncio.Condition()
+
+    async def start(self):
+        """Conecta ao servidor configurado (abrindo-o se preciso) ou abre um navegador novo"""
+        self.playwright = await async_playwright().start()
+        try:
+            if self.server_url:
+                self.browser = await self._connect()
+            if self.browser is None:
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        except BaseException:
+            await self.playwright.stop()
+            self.playwright = None
+            raise
+        return self.browser
+
+    async def _connect(self):
+        port = urlparse(self.server_url).port
+        try:
+            browser = await self.playwright.chromium.connect_over_cdp(self.server_url)
+            print(f"Conectado ao navegador já aberto em {self.server_url}")
+        except Exception as e:
+            if not self.spawn_server or port is None:
+                print(f"Navegador em {self.server_url} indisponível ({str(e)[:80]}), abrindo um novo")
+                return None
+            print(f"Abrindo navegador persistente na porta {port}...")
+            spawn_browser_server(self.playwright.chromium.executable_path, port, self.user_data_dir, self.headless)
+            browser = None
+            deadline = time.monotonic() + 30
+            while browser is None:
+                try:
+                    browser = await self.playwright.chromium.connect_over_cdp(self.server_url)
+                except Exception:
+                    if time.monotonic() > deadline:
+                        raise
+                    await asyncio.sleep(0.5)
+        self.connected = True
+        self.server_pid = find_server_pid(port) if port else None
+        return browser
+
+    async def new_context(self, storage_state=None):
+        if self.context_factory is not None:
+            return await self.context_factory(self.browser, storage_state)
+        return await self.browser.new_context(storage_state=storage_state)
+
+    async def adopt(self, context, workers, first_page=None):
+        """Passa a gerenciar o contexto já logado, com uma página por worker"""
+        self.context = context
+        self.pages = [first_page] if first_page is not None else []
+        while len(self.pages) < workers:
+            self.pages.append(await context.new_page())
+        self._page_uses = [0] * workers
+        self._context_uses = 0
+        return self.pages
+
+    async def acquire(self, worker):
+        """Página do worker; espera enquanto o contexto está sendo trocado"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._draining)
+            self._active += 1
+        page = self.pages[worker]
+        if self.recycle_pages_after and self._page_uses[worker] >= self.recycle_pages_after:
+            page = await self._replace_page(worker)
+        return page
+
+    async def release(self, worker):
+        """Fim de um domínio no worker; dispara a troca do contexto quando chega a hora"""
+        self._page_uses[worker] += 1
+        self._context_uses += 1
+        async with self._condition:
+            self._active -= 1
+            if not self._draining:
+                reason = self._recycle_reason()
+                if reason:
+                    print(f"Trocando o contexto do navegador ({reason}) assim que os domínios em andamento terminarem")
+                    self._draining = True
+            if self._draining and self._active == 0:
+                try:
+                    await self._recycle_context()
+                finally:
+                    self._draining = False
+                    self._condition.notify_all()
+
+    def _recycle_reason(self):
+        if self.recycle_context_after and self._context_uses >= self.recycle_context_after:
+            return f"{self._context_uses} domínios"
+        if self.rss_limit_mb:
+            rss_mb = self.rss_kb() / 1024
+            if not self._rss_armed and (
+                rss_mb < self.rss_rearm_mb or self._context_uses >= self.rss_min_domains
+            ):
+                self._rss_armed = True
+            if self._rss_armed and rss_mb >= self.rss_limit_mb:
+                self._rss_armed = False
+                return f"RSS de {rss_mb:.0f} MB"
+        return None
+
+    async def _replace_page(self, worker):
+        old = self.pages[worker]
+        self.pages[worker] = await self.context.new_page()
+        self._page_uses[worker] = 0
+        self.page_recycles += 1
+        await old.close()
+        return self.pages[worker]
+
+    async def _recycle_context(self):
+        state = await self.context.storage_state()
+        old = self.context
+        self.context = await self.new_context(state)
+        self.pages = [await self.context.new_page() for _ in self.pages]
+        self._page_uses = [0] * len(self.pages)
+        self._context_uses = 0
+        self.context_recycles += 1
+        await old.close()
+        print(f"Contexto trocado; RSS do navegador agora em {self.rss_kb() / 1024:.0f} MB")
+
+    def rss_kb(self):
+        """RSS do navegador: o servidor conectado ou a árvore deste processo"""
+        rss = tree_rss_kb(self.server_pid) if self.server_pid else tree_rss_kb(os.getpid())
+        self.peak_rss_kb = max(self.peak_rss_kb, rss)
+        return rss
+
+    async def close(self):
+        """Fecha o contexto e, se foi aberto aqui, o navegador; encerra o driver do Playwright"""
+        try:
+            if self.context is not None:
+                await self.context.close()
+        except Exception as e:
+            print(f"Erro ao fechar o contexto: {str(e)}")
+        try:
+            # O servidor persistente continua aberto para a próxima execução
+            if self.browser is not None and not self.connected:
+                await self.browser.close()
+        except Exception as e:
+            print(f"Erro ao fechar o navegador: {str(e)}")
+        finally:
+            self.context = None
+            self.browser = None
+            self.pages = []
+            if self.playwright is not None:
+                await self.playwright.stop()
+                self.playwright = None
+
+    def report(self):
+        """Trocas de página e de contexto e pico de memória do navegador"""
+        self.rss_kb()
+        print("\n=== Navegador ===")
+        origin = f"servidor {self.server_url}" if self.connected else "aberto nesta execução"
+        print(
+            f"{origin} | páginas trocadas: {self.page_recycles} | contextos trocados: {self.context_recycles} "
+            f"| pico de RSS: {self.peak_rss_kb / 1024:.0f} MB"
+        )
+
+
+async def _serve(port, user_data_dir, headless):
+    async with async_playwright() as playwright:
+        pid = spawn_browser_server(playwright.chromium.executable_path, port, user_data_dir, headless)
+    print(f"Chromium (pid {pid}) ouvindo em http://127.0.0.1:{port}")
+    print(f"Use BROWSER_SERVER = \"http://127.0.0.1:{port}\" no domain_checker.py")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--headless"]
+    asyncio.run(_serve(
+        int(args[0]) if len(args) > 0 else 9222,
+        args[1] if len(args) > 1 else None,
+        "--headless" in sys.argv,
+    ))
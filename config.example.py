@@ -1 +1,15 @@
- 
\ No newline at end of file
+# Credenciais do SEOPack
+SEOPACK_LOGIN = "seu_usuario"
+SEOPACK_PASSWORD = "sua_senha"
+
+# URLs
+SEOPACK_LOGIN_URL = "https://seopacktools.com/login"
+SEOPACK_DASHBOARD_URL = "https://smr.seopacktools.com/dashboard"
+
+# Opcional: uma conta por shard (python domain_checker.py --shard conta1).
+# Os domínios são divididos entre as contas por hashing; incluir ou remover
+# uma conta só move os domínios que passam a ser (ou eram) dela.
+# SEOPACK_ACCOUNTS = {
+#     "conta1": {"login": "usuario1", "password": "senha1"},
+#     "conta2": {"login": "usuario2", "password": "senha2"},
+# }
@@ -0,0 +1,198 @@
+"""
+Diagnóstico de falhas: amostragem, deduplicação por assinatura do erro, limite de espaço e trace sob demanda
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+INDEX_FILE = "diagnostics.jsonl"
+
+_VARIABLE_PARTS = re.compile(r"0x[0-9a-f]+|\d+(\.\d+)?")
+
+
+def error_signature(error, page_url=None, domain=None):
+    """Assinatura estável do erro: tipo, primeira linha da mensagem e caminho da página, sem números nem o domínio"""
+    message = str(error).strip().splitlines()[0] if str(error).strip() else ""
+    path = urlparse(page_url).path if page_url else ""
+    text = f"{type(error).__name__}|{message}|{path}".lower()
+    if domain:
+        text = text.replace(domain.lower(), "<domínio>")
+    text = _VARIABLE_PARTS.sub("#", text)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9.-]+", "_", value.lower()).strip("_")[:60]
+
+
+class Diagnostics:
+    """Guarda evidências das falhas sem deixar uma onda de erros custar tempo e disco
+
+    A primeira ocorrência de cada assinatura sempre gera screenshot; as
+    repetições só com probabilidade sample_rate, até max_per_signature. Os
+    arquivos formam um buffer circular: acima de max_bytes, os mais antigos
+    são apagados. Depois de uma falha, o próximo domínio pode rodar com o
+    trace do Playwright ligado, guardado só se ele também falhar.
+    """
+
+    def __init__(
+        self,
+        directory="debug/falhas",
+        max_bytes=50 * 1024 * 1024,
+        sample_rate=0.1,
+        max_per_signature=3,
+        trace_after_failure=True,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.max_per_signature = max_per_signature
+        self.trace_after_failure = trace_after_failure
+        self.occurrences = defaultdict(int)
+        self.captured = defaultdict(int)
+        self.skipped = 0
+        self.evicted = 0
+        self.traces = 0
+        self._files = None
+        self._total = 0
+        self._sequence = 0
+        self._trace_requested = False
+        self._tracing = None  # (contexto, domínio) com trace ligado
+
+    def _load(self):
+        """Arquivos de execuções anteriores entram no buffer, do mais antigo ao mais novo"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != INDEX_FILE and os.path.isfile(path):
+                entries.append((os.path.getmtime(path), path, os.path.getsize(path)))
+        self._files = deque((path, size) for _, path, size in sorted(entries))
+        self._total = sum(size for _, size in self._files)
+
+    def _register(self, path):
+        if not os.path.exists(path):
+            return
+        size = os.path.getsize(path)
+        self._files.append((path, size))
+        self._total += size
+        # Nunca apaga o arquivo que acabou de entrar
+        while self._total > self.max_bytes and len(self._files) > 1:
+            old_path, old_size = self._files.popleft()
+            self._total -= old_size
+            self.evicted += 1
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def _path(self, label, domain, signature, extension):
+        """Nome único: horário, processo e sequência, além do rótulo, domínio e assinatura"""
+        self._sequence += 1
+        parts = [f"{datetime.now():%Y%m%d-%H%M%S}", str(os.getpid()), f"{self._sequence:04d}", _slug(label)]
+        parts += [part for part in (domain and _slug(domain), signature) if part]
+        return os.path.join(self.directory, "-".join(parts) + f".{extension}")
+
+    def should_capture(self, signature):
+        """Primeira ocorrência sempre; repetições por amostragem, até o limite da assinatura"""
+        self.occurrences[signature] += 1
+        if self.captured[signature] >= self.max_per_signature:
+            return False
+        if self.occurrences[signature] == 1:
+            return True
+        return random.random() < self.sample_rate
+
+    async def capture(self, page, label, error, domain=None, html=False):
+        """Screenshot (e HTML, se pedido) da falha, se ela passar pela deduplicação e pela amostragem"""
+        try:
+            page_url = page.url if page is not None else None
+            signature = error_signature(error, page_url, domain)
+            if self.trace_after_failure and self._tracing is None:
+                self._trace_requested = True
+            if page is None or page.is_closed():
+                self.occurrences[signature] += 1
+                self.skipped += 1
+                return None
+            if not self.should_capture(signature):
+                self.skipped += 1
+                return None
+            if self._files is None:
+                self._load()
+
+            screenshot_path = self._path(label, domain, signature, "jpg")
+            # Só a área visível, em JPEG: uma fração do tempo e do tamanho da página inteira em PNG
+            await page.screenshot(path=screenshot_path, type="jpeg", quality=60)
+            self._register(screenshot_path)
+            files = [screenshot_path]
+            if html:
+                html_path = self._path(label, domain, signature, "html")
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(await page.content())
+                self._register(html_path)
+                files.append(html_path)
+            self.captured[signature] += 1
+
+            with open(os.path.join(self.directory, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "signature": signature,
+                    "label": label,
+                    "domain": domain,
+                    "error": f"{type(error).__name__}: {str(error)[:300]}",
+                    "url": page_url,
+                    "files": files,
+                }, ensure_ascii=False) + "\n")
+            print(f"Diagnóstico da falha ({signature}) salvo em {screenshot_path}")
+            return screenshot_path
+        except Exception as e:
+            print(f"Não foi possível salvar o diagnóstico: {str(e)}")
+            return None
+
+    async def begin_domain(self, context, domain):
+        """Liga o trace do Playwright para este domínio se uma falha anterior pediu"""
+        if not self._trace_requested or self._tracing is not None:
+            return
+        self._trace_requested = False
+        try:
+            await context.tracing.start(screenshots=True, snapshots=True)
+            self._tracing = (context, domain)
+            print(f"Trace do Playwright ligado para {domain}")
+        except Exception as e:
+            print(f"Não foi possível ligar o trace: {str(e)}")
+
+    async def end_domain(self, context, domain, ok):
+        """Desliga o trace do domínio; o arquivo só é guardado se o domínio falhou"""
+        if self._tracing != (context, domain):
+            return
+        self._tracing = None
+        try:
+            if ok:
+                await context.tracing.stop()
+                return
+            if self._files is None:
+                self._load()
+            trace_path = self._path("trace", domain, None, "zip")
+            await context.tracing.stop(path=trace_path)
+            self._register(trace_path)
+            self.traces += 1
+            print(f"Trace da falha salvo em {trace_path} (abra com: playwright show-trace {trace_path})")
+        except Exception as e:
+            print(f"Não foi possível salvar o trace: {str(e)}")
+
+    def report(self):
+        """Falhas por assinatura, capturas evitadas e espaço ocupado"""
+        if not self.occurrences:
+            return
+        print("\n=== Diagnóstico de falhas ===")
+        for signature, count in sorted(self.occurrences.items(), key=lambda item: item[1], reverse=True):
+            print(f"{signature}: {count} ocorrências, {self.captured[signature]} capturadas")
+        print(
+            f"Capturas evitadas: {self.skipped} | traces: {self.traces} | removidos pelo limite: {self.evicted} "
+            f"| ocupado: {self._total / 1024 / 1024:.1f} MB em {self.directory}"
+        )
@@ -4,11 +4,12 @@ Script para verificação automática de backlinks e disponibilidade de domínio
 
 import asyncio
 import os
+import re
 import json
 import requests
 import subprocess
 import sys
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+from playwright.async_api import Page, Browser, BrowserContext
 from config import *
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -22,39 +23,171 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time
+from worker_pool import RateLimiter, run_worker_pool, print_worker_report
+from session_cache import SessionCache
+from selector_resolver import SelectorCache, resolve_selector
+from step_timing import StepTimer
+from network_policy import NetworkPolicy
+from export_replay import ExportReplayer, ExportReplayError
+from backlink_stream import XhrCapture, stream_backlinks
+from history_store import HistoryStore, DATE_FORMAT as HISTORY_DATE_FORMAT
+from work_queue import WorkQueue, LeasedSource
+from backlink_cleaner import clean_backlinks
+from domain_verifier import SystemResolver, ResultCache, verify_file
+from pipeline import Pipeline, Stage
+from artifact_store import ArtifactStore
+from backlink_delta import BacklinkIndex
+from referring_index import ReferringIndex
+from scheduler import AdaptiveScheduler, FixedPolicy, plan
+from run_planner import ProgressJournal, CostModel, RunPlanner, DeadlineSource
+from instrumentation import Instrumentation, add_file_bytes
+from sharding import accounts_from_config, assign_domains, shard_file, seed_history
+from resilience import Resilience, RetryPolicy, CircuitBreaker, GuardedSource, classify_error, SELECTOR_MISSING, UNKNOWN
+from browser_manager import BrowserManager
+from diagnostics import Diagnostics
+from drive_publisher import DrivePublisher, DRIVE_BASE_URL as DRIVE_API_URL, google_token_provider
 
 # Se modificar esses escopos, delete o arquivo token.json
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
 # Configurações
 HEADLESS = True  # Alterado para True para rodar sem interface gráfica
-DELAY_BETWEEN_REQUESTS = 5  # segundos
+DELAY_BETWEEN_REQUESTS = 5  # segundos (intervalo mínimo global entre domínios)
+CONCURRENT_WORKERS = 3  # páginas processando domínios em paralelo
 MAX_RETRIES = 3
 TIMEOUT = 60000  # 60 segundos
+SEMRUSH_BASE_URL = "https://smr.seopacktools.com"  # troque pela URL do bench/mock_seopack.py para testes locais
+SESSION_FILE = "auth.json"
+BROWSER_SERVER = None  # ex.: "http://127.0.0.1:9222" reaproveita um Chromium aberto (python browser_manager.py 9222)
+RECYCLE_PAGE_AFTER = 25  # domínios por página antes de trocá-la por uma nova
+RECYCLE_CONTEXT_AFTER = 100  # domínios por contexto antes de recriá-lo com a mesma sessão
+BROWSER_RSS_LIMIT_MB = 1500  # acima disso o contexto é recriado assim que os workers ficam livres
+BROWSER_RSS_MIN_DOMAINS = 20  # se o RSS não cair abaixo de 80% do limite, domínios até a próxima troca por RSS
+SESSION_MAX_AGE = timedelta(hours=12)  # validade máxima da sessão salva
+SESSION_CHECK_TIMEOUT = 15000  # 15 segundos
+
+SELECTOR_CACHE_FILE = "selector_cache.json"
+DOWNLOAD_TIMEOUT = 120000  # 2 minutos para o download terminar
+NETWORK_BLOCKING = True  # bloqueia imagens, fontes, rastreadores e widgets
+API_MODE = True  # repete a exportação gravada via HTTP em vez de usar a interface
+STREAM_MODE = False  # grava as linhas das respostas JSON da tabela em vez do Excel
+STREAM_FORMAT = "jsonl"  # jsonl, csv ou parquet
+BACKLINKS_XHR_PATTERN = r"backlinks"  # URLs das respostas JSON que preenchem a tabela
+HISTORY_DB = "domain_history.db"
+LEGACY_HISTORY_FILE = "domain_history.json"  # importado uma vez para o SQLite
+RECHECK_INTERVAL = timedelta(days=7)  # intervalo padrão (e o único, sem o agendamento adaptativo)
+ADAPTIVE_SCHEDULING = True  # reverifica antes quem muda muito e adia quem não muda
+RECHECK_MIN_INTERVAL = timedelta(days=1)
+RECHECK_MAX_INTERVAL = timedelta(days=30)
+RECHECK_TARGET_CHANGE = 0.05  # fração do perfil que pode mudar antes de reverificar
+RUN_TIME_BUDGET = timedelta(minutes=25)  # o workflow é encerrado aos 30 minutos
+DOMAIN_COST_ESTIMATE = 120  # segundos por domínio, até haver medições
+RUN_JOURNAL_FILE = "run_journal.jsonl"  # estágios concluídos, para retomar após interrupção
+RUN_COSTS_FILE = "run_costs.json"  # tempo medido de cada estágio por domínio
+RETRY_BASE_DELAY = 2  # segundos; dobra a cada tentativa, com jitter
+RETRY_MAX_DELAY = 60
+BREAKER_WINDOW = 10  # operações recentes consideradas pelo disjuntor
+BREAKER_FAILURE_RATE = 0.6  # fração de falhas que abre o disjuntor
+BREAKER_COOLDOWN = 120  # segundos de pausa; dobra se o teste seguinte falhar
+BREAKER_MAX_TRIPS = 3  # aberturas toleradas antes de encerrar a execução
+METRICS_LOG = "debug/metrics.jsonl"  # um span por linha
+METRICS_PROM_FILE = "debug/backlinks.prom"  # formato do textfile collector do node_exporter
+DIAGNOSTICS_DIR = "debug/falhas"  # screenshots, HTML e traces das falhas
+DIAGNOSTICS_MAX_MB = 50  # acima disso os diagnósticos mais antigos são apagados
+DIAGNOSTICS_SAMPLE_RATE = 0.1  # chance de capturar de novo um erro com a mesma assinatura
+DIAGNOSTICS_PER_SIGNATURE = 3  # capturas no máximo por assinatura de erro
+TRACE_AFTER_FAILURE = True  # grava o trace do Playwright do domínio seguinte a uma falha
+SHARD_NAME = None  # conta de SEOPACK_ACCOUNTS deste processo (python domain_checker.py --shard <conta>)
+MERGED_HISTORY_DB = "domain_history.db"  # histórico combinado dos shards (python sharding.py merge ...)
+QUEUE_DB = "domain_queue.db"
+QUEUE_LEASE_SECONDS = 900  # um domínio não confirmado em 15 min volta para a fila
+QUEUE_DEAD_COOLDOWN = timedelta(days=7)  # espera de um domínio que esgotou as tentativas (ou python work_queue.py ... requeue)
+VERIFIER_CONCURRENCY = 200  # consultas DNS simultâneas
+VERIFICATION_CACHE_FILE = "verification_cache.json"
+VERIFICATION_CACHE_TTL = 6 * 3600  # segundos
+PIPELINE_MODE = True  # sobrepõe coleta, limpeza, verificação e publicação de domínios diferentes
+CLEAN_CONCURRENCY = 2
+VERIFY_CONCURRENCY = 2
+PUBLISH_CONCURRENCY = 1
+PIPELINE_QUEUE_SIZE = 4  # itens aguardando entre estágios antes de segurar o anterior
+PUBLISH_TO_DRIVE = False  # envia o resultado de cada domínio ao Google Drive
+DRIVE_FOLDER_ID = "18YfwC0NOI5vhB3ih-1mAdh8QfBR0luGf"
+DRIVE_BASE_URL = DRIVE_API_URL  # troque pela URL do bench/fake_drive.py para testes locais
+DRIVE_TOKEN_FILE = "token.json"
+DRIVE_UPLOAD_WORKERS = 2
+DRIVE_LEDGER_FILE = "uploaded_hashes.json"  # hashes já publicados, para nunca repetir upload
+ARTIFACT_STORE = True  # guarda cada exportação uma única vez, pelo hash do conteúdo
+ARTIFACT_STORE_DIR = "Google Drive/exportacoes"
+ARTIFACT_COMPRESSION = "xz"  # None, "xz" ou "gzip"
+ARTIFACT_CONVERT = None  # "parquet" converte a exportação: xlsx, csv ou jsonl (requer pandas + pyarrow)
+ARTIFACT_KEEP_VERSIONS = 10  # versões mantidas por domínio
+ARTIFACT_MAX_AGE_DAYS = 90
+INCREMENTAL_DELTAS = True  # limpa e verifica só os backlinks novos desde a última exportação
+BACKLINK_INDEX_DB = "backlink_fingerprints.db"
+REFERRING_INDEX = True  # domínio de referência → domínios monitorados (python referring_index.py referring_domains.db ...)
+REFERRING_INDEX_DB = "referring_domains.db"
+
+# Seletores do fluxo de exportação
+EXPORT_BUTTON_SELECTOR = 'span[data-ui-name="Button.Text"]:text("Export"):not(:has-text("PDF"))'
+EXCEL_OPTION_SELECTOR = 'div[data-ui-name="DropdownMenu.Item"][data-test-export-type="xls"]'
+
+session_cache = SessionCache(SESSION_FILE, SESSION_MAX_AGE)
+selector_cache = SelectorCache(SELECTOR_CACHE_FILE)
+step_timer = StepTimer()
+instrumentation = Instrumentation(METRICS_LOG, METRICS_PROM_FILE)
+diagnostics = Diagnostics(
+    DIAGNOSTICS_DIR,
+    max_bytes=DIAGNOSTICS_MAX_MB * 1024 * 1024,
+    sample_rate=DIAGNOSTICS_SAMPLE_RATE,
+    max_per_signature=DIAGNOSTICS_PER_SIGNATURE,
+    trace_after_failure=TRACE_AFTER_FAILURE,
+)
+network_policy = NetworkPolicy()
+export_replayer = ExportReplayer(max_connections=CONCURRENT_WORKERS * 2)
+history_store = None
+work_queue = None
+dns_resolver = None
+verification_cache = ResultCache(VERIFICATION_CACHE_FILE, ttl=VERIFICATION_CACHE_TTL)
+drive_publisher = None
+artifact_store = None
+browser_manager = None
+backlink_index = None
+referring_index = None
+run_planner = None
+resilience = Resilience(
+    RetryPolicy(MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY),
+    CircuitBreaker(
+        window=BREAKER_WINDOW,
+        failure_threshold=BREAKER_FAILURE_RATE,
+        cooldown=BREAKER_COOLDOWN,
+        max_trips=BREAKER_MAX_TRIPS,
+    ),
+)
+if ADAPTIVE_SCHEDULING:
+    scheduler = AdaptiveScheduler(
+        RECHECK_INTERVAL, RECHECK_MIN_INTERVAL, RECHECK_MAX_INTERVAL, target_change=RECHECK_TARGET_CHANGE
+    )
+else:
+    scheduler = FixedPolicy(RECHECK_INTERVAL)
 
 async def save_storage_state(context):
     """Salva o estado da sessão"""
     print("\nSalvando estado da sessão...")
-    await context.storage_state(path="auth.json")
-    print("Estado da sessão salvo!")
+    expires_at = session_cache.save(await context.storage_state())
+    print(f"Estado da sessão salvo! Válido até {expires_at:%Y-%m-%d %H:%M:%S}")
 
-async def load_storage_state(context):
-    """Carrega o estado da sessão"""
-    try:
-        if os.path.exists("auth.json"):
-            print("\nCarregando estado da sessão...")
-            await context.storage_state(path="auth.json")
-            print("Estado da sessão carregado!")
-            return True
-    except Exception as e:
-        print(f"Erro ao carregar estado da sessão: {str(e)}")
-    return False
+def load_storage_state():
+    """Carrega o estado da sessão salvo, se ainda dentro da validade"""
+    state = session_cache.load()
+    if state:
+        print("\nEstado da sessão carregado do cache!")
+    return state
 
 async def check_login_status(page):
     """Verifica se ainda está logado"""
     try:
-        await page.goto(SEOPACK_DASHBOARD_URL, timeout=60000)
-        await page.wait_for_load_state('networkidle', timeout=60000)
+        # Só precisa do redirecionamento, não de a página terminar de carregar
+        await page.goto(SEOPACK_DASHBOARD_URL, wait_until="domcontentloaded", timeout=SESSION_CHECK_TIMEOUT)
         
         # Verifica se está na página de login
         current_url = page.url
@@ -69,22 +202,60 @@ async def check_login_status(page):
         print(f"Erro ao verificar status do login: {str(e)}")
         return False
 
+async def new_context(browser, storage_state=None):
+    """Cria um contexto com a política de bloqueio de rede instalada"""
+    context = await browser.new_context(storage_state=storage_state)
+    if NETWORK_BLOCKING:
+        await network_policy.install(context)
+    return context
+
+async def open_session(browser):
+    """Cria o contexto com a sessão salva, fazendo login completo só se ela expirou"""
+    state = load_storage_state()
+    if state:
+        context = await new_context(browser, state)
+        page = await context.new_page()
+        if await check_login_status(page):
+            return context, page
+        session_cache.invalidate()
+        await context.close()
+    
+    context = await new_context(browser)
+    page = await context.new_page()
+    
+    # Faz login no SEOPack
+    await login_seopack(page)
+    
+    # Acessa o SEMrush
+    await access_semrush(page)
+    
+    await save_storage_state(context)
+    return context, page
+
+async def relogin(context):
+    """Renova a sessão do contexto compartilhado após um erro de sessão expirada"""
+    session_cache.invalidate()
+    page = await context.new_page()
+    try:
+        await login_seopack(page)
+        await access_semrush(page)
+        await save_storage_state(context)
+        # O modo API usa os cookies do contexto; sem isso continuaria com a sessão velha
+        await export_replayer.update_cookies(context)
+    finally:
+        await page.close()
+
+@instrumentation.traced("login_seopack")
 async def login_seopack(page):
     """Realiza login no SEOPack"""
     try:
         print("=== Iniciando processo de login ===")
         
         # Acessa a página de login
+        # Os campos são esperados pelo seletor, não é preciso esperar a rede ficar ociosa
         print("Acessando página de login...")
-        await page.goto(SEOPACK_LOGIN_URL)
-        
-        # Aguarda a página carregar completamente
-        print("Aguardando página carregar...")
-        await page.wait_for_load_state("networkidle", timeout=60000)  # 60 segundos
-        await page.wait_for_load_state("domcontentloaded", timeout=60000)
-        
-        # Aguarda um pouco para garantir que a página está totalmente carregada
-        await asyncio.sleep(5)
+        async with step_timer.step("login: página"):
+            await page.goto(SEOPACK_LOGIN_URL, wait_until="domcontentloaded", timeout=TIMEOUT)
         
         print("Página carregada, aguardando elementos...")
         
@@ -121,59 +292,22 @@ async def login_seopack(page):
             '.btn-login'
         ]
         
-        # Tenta encontrar o campo de usuário
+        # Disputa todos os seletores de cada campo em paralelo
         print("Procurando campo de usuário...")
-        usuario_input = None
-        for selector in usuario_selectors:
-            print(f"Tentando seletor: {selector}")
-            try:
-                usuario_input = await page.wait_for_selector(selector, timeout=10000)
-                if usuario_input:
-                    print(f"Campo de usuário encontrado com seletor: {selector}")
-                    break
-            except Exception as e:
-                print(f"Seletor {selector} não encontrado: {str(e)}")
-                continue
+        async with step_timer.step("login: campos"):
+            usuario_input = await resolve_selector(page, selector_cache, "login", "usuario", usuario_selectors)
         
         if not usuario_input:
-            # Se não encontrou o campo, salva informações para debug
-            print("Campo de usuário não encontrado, salvando informações para debug...")
-            print(f"URL atual: {page.url}")
-            await page.screenshot(path="debug/login_error.png")
-            with open("debug/login_page.html", "w", encoding="utf-8") as f:
-                f.write(await page.content())
             raise Exception("Campo de usuário não encontrado")
         
-        # Tenta encontrar o campo de senha
         print("Procurando campo de senha...")
-        senha_input = None
-        for selector in senha_selectors:
-            print(f"Tentando seletor: {selector}")
-            try:
-                senha_input = await page.wait_for_selector(selector, timeout=10000)
-                if senha_input:
-                    print(f"Campo de senha encontrado com seletor: {selector}")
-                    break
-            except Exception as e:
-                print(f"Seletor {selector} não encontrado: {str(e)}")
-                continue
+        senha_input = await resolve_selector(page, selector_cache, "login", "senha", senha_selectors)
         
         if not senha_input:
             raise Exception("Campo de senha não encontrado")
         
-        # Tenta encontrar o botão de login
         print("Procurando botão de login...")
-        login_button = None
-        for selector in login_button_selectors:
-            print(f"Tentando seletor: {selector}")
-            try:
-                login_button = await page.wait_for_selector(selector, timeout=10000)
-                if login_button:
-                    print(f"Botão de login encontrado com seletor: {selector}")
-                    break
-            except Exception as e:
-                print(f"Seletor {selector} não encontrado: {str(e)}")
-                continue
+        login_button = await resolve_selector(page, selector_cache, "login", "botao", login_button_selectors)
         
         if not login_button:
             raise Exception("Botão de login não encontrado")
@@ -190,40 +324,37 @@ async def login_seopack(page):
         # Aguarda a navegação para o dashboard
         print("Aguardando redirecionamento para o dashboard...")
         try:
-            await page.wait_for_url(SEOPACK_DASHBOARD_URL, timeout=30000)
+            async with step_timer.step("login: redirecionamento"):
+                await page.wait_for_url(SEOPACK_DASHBOARD_URL, timeout=30000)
             print("Login realizado com sucesso!")
         except Exception as e:
             print(f"Erro ao aguardar redirecionamento: {str(e)}")
-            # Salva informações para debug
-            print(f"URL atual: {page.url}")
-            await page.screenshot(path="debug/login_error.png")
-            with open("debug/login_page.html", "w", encoding="utf-8") as f:
-                f.write(await page.content())
             raise Exception("Falha no redirecionamento após login")
         
     except Exception as e:
         print(f"ERRO no login: {str(e)}")
-        # Salva informações para debug
+        # Salva informações para debug (uma vez por assinatura de erro)
         print(f"URL atual: {page.url}")
-        await page.screenshot(path="debug/login_error.png")
-        with open("debug/login_page.html", "w", encoding="utf-8") as f:
-            f.write(await page.content())
+        await diagnostics.capture(page, "login", e, html=True)
         raise
 
+@instrumentation.traced("access_semrush")
 async def access_semrush(page):
     """Acessa o SEMrush através do SEOPack"""
     try:
         print("\n=== Acessando SEMrush ===")
         print("Navegando para o dashboard do SEMrush...")
-        await page.goto(SEOPACK_DASHBOARD_URL, timeout=60000)
-        await page.wait_for_load_state('networkidle', timeout=60000)
-        await page.wait_for_timeout(5000)  # Espera 5 segundos
+        async with step_timer.step("semrush: dashboard"):
+            await page.goto(SEOPACK_DASHBOARD_URL, wait_until="domcontentloaded", timeout=60000)
+            # Espera o botão ficar visível em vez de um tempo fixo
+            await page.wait_for_selector('text=ACESS SEMRUSH 01', state="visible", timeout=60000)
         
         print("Clicando no botão ACESS SEMRUSH 01...")
         
         # Espera por uma nova aba ser aberta quando clicar no botão
-        async with page.context.expect_page() as new_page_info:
-            await page.click('text=ACESS SEMRUSH 01', timeout=60000)
+        async with step_timer.step("semrush: popup"):
+            async with page.context.expect_page(timeout=60000) as new_page_info:
+                await page.click('text=ACESS SEMRUSH 01', timeout=60000)
             popup = await new_page_info.value
             
         # Fecha a nova aba
@@ -233,74 +364,61 @@ async def access_semrush(page):
         
     except Exception as e:
         print(f"\nERRO ao acessar SEMrush: {str(e)}")
-        try:
-            current_url = page.url
-            print("URL atual:", current_url)
-            await page.screenshot(path="debug/semrush_error.png")
-            print("Screenshot do erro salvo em debug/semrush_error.png")
-        except:
-            print("Não foi possível obter informações adicionais do erro")
+        print("URL atual:", page.url)
+        await diagnostics.capture(page, "semrush", e)
         raise
 
-async def upload_to_drive(file_path):
-    """Faz upload do arquivo para o Google Drive usando gdown"""
+def get_drive_publisher():
+    """Inicia o publicador do Google Drive na primeira chamada"""
+    global drive_publisher
+    if drive_publisher is None:
+        token_provider = None
+        if os.path.exists(DRIVE_TOKEN_FILE):
+            token_provider = google_token_provider(DRIVE_TOKEN_FILE, SCOPES)
+        elif DRIVE_BASE_URL == DRIVE_API_URL:
+            print(f"AVISO: {DRIVE_TOKEN_FILE} não encontrado, o Drive deve recusar os uploads")
+        drive_publisher = DrivePublisher(
+            DRIVE_FOLDER_ID,
+            token_provider=token_provider,
+            base_url=DRIVE_BASE_URL,
+            workers=DRIVE_UPLOAD_WORKERS,
+            ledger_path=DRIVE_LEDGER_FILE,
+        )
+        drive_publisher.start()
+    return drive_publisher
+
+async def close_drive_publisher():
+    """Espera os uploads em segundo plano terminarem"""
+    if drive_publisher is not None:
+        print("\nAguardando uploads pendentes para o Google Drive...")
+        await drive_publisher.close()
+
+def backlinks_file_path(domain, extension="xlsx"):
+    """Caminho do arquivo de backlinks do domínio na pasta Google Drive"""
+    # Cria pasta Google Drive se não existir
+    drive_folder = "Google Drive"
+    if not os.path.exists(drive_folder):
+        os.makedirs(drive_folder)
+        print(f"Pasta {drive_folder} criada")
+    
+    # Nome com timestamp e nome do domínio
+    now = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_name = f"backlinks_{domain}_{now}.{extension}"
+    return os.path.join(drive_folder, file_name)
+
+async def fetch_backlinks_api(domain):
+    """Baixa a exportação pelo modo API; retorna None para cair no navegador"""
     try:
-        print("\n=== Fazendo upload para o Google Drive ===")
-        
-        # Verifica se o arquivo existe
-        if not os.path.exists(file_path):
-            print(f"ERRO: Arquivo {file_path} não encontrado!")
-            return False
-            
-        print(f"Arquivo encontrado: {file_path}")
-        print(f"Tamanho: {os.path.getsize(file_path)} bytes")
-        
-        # Instala gdown se necessário
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "gdown"])
-        except:
-            print("Erro ao instalar gdown, tentando continuar...")
-        
-        # ID da pasta pública
-        FOLDER_ID = "18YfwC0NOI5vhB3ih-1mAdh8QfBR0luGf"
-        
-        # Prepara o nome do arquivo com timestamp
-        now = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_name = f"backlinks_{now}.xlsx"
-        
-        print(f"Iniciando upload do arquivo {file_name}...")
-        
-        # Usa gdown para fazer o upload
-        try:
-            import gdown
-            url = f"https://drive.google.com/drive/folders/{FOLDER_ID}"
-            gdown.upload(file_path, url, fuzzy=True)
-            print("Upload concluído com sucesso!")
-            return True
-        except Exception as e:
-            print(f"Erro ao usar gdown: {str(e)}")
-            print("Tentando método alternativo...")
-            
-            # Tenta método alternativo usando curl
-            try:
-                curl_cmd = f'curl -X POST -L -F "file=@{file_path}" "https://drive.google.com/drive/folders/{FOLDER_ID}?usp=sharing"'
-                result = subprocess.run(curl_cmd, shell=True, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    print("Upload concluído com sucesso (método alternativo)!")
-                    return True
-                else:
-                    print(f"Erro no upload alternativo: {result.stderr}")
-                    return False
-            except Exception as e2:
-                print(f"Erro no método alternativo: {str(e2)}")
-                return False
-            
-    except Exception as e:
-        print(f"\nERRO ao fazer upload para o Drive: {str(e)}")
-        print("Detalhes do erro:", str(e.__class__.__name__))
-        raise
+        async with step_timer.step("export: api"):
+            file_path = await export_replayer.fetch(domain, backlinks_file_path(domain))
+        add_file_bytes(file_path)
+        print(f"Download via modo API concluído: {file_path}")
+        return file_path
+    except ExportReplayError as e:
+        print(f"Modo API falhou para {domain} ({str(e)}), usando o navegador...")
+        return None
 
+@instrumentation.traced("download_backlinks_excel", domain_arg=1)
 async def download_backlinks_excel(page, domain):
     """Faz o download do arquivo Excel de backlinks"""
     try:
@@ -308,169 +426,216 @@ async def download_backlinks_excel(page, domain):
         
         # Clica no botão Export
         print("Clicando no botão Export...")
-        export_button = await page.wait_for_selector('span[data-ui-name="Button.Text"]:text("Export"):not(:has-text("PDF"))', timeout=60000)
+        export_button = await page.wait_for_selector(EXPORT_BUTTON_SELECTOR, timeout=60000)
         if not export_button:
             raise Exception("Botão Export não encontrado")
         await export_button.click()
-        await page.wait_for_timeout(2000)
         
-        # Clica na opção Excel
+        # Clica na opção Excel assim que o menu abrir
         print("Selecionando formato Excel...")
-        excel_option = await page.wait_for_selector('div[data-ui-name="DropdownMenu.Item"][data-test-export-type="xls"]', timeout=60000)
+        async with step_timer.step("export: menu"):
+            excel_option = await page.wait_for_selector(EXCEL_OPTION_SELECTOR, state="visible", timeout=60000)
         if not excel_option:
             raise Exception("Opção Excel não encontrada")
-        await excel_option.click()
         
-        # Espera o download começar e terminar
+        # Grava a requisição de exportação para o modo API, se ainda não gravada
+        if API_MODE:
+            export_replayer.start_recording(page)
+        
+        # O clique precisa acontecer dentro do expect_download para não perder o evento
         print("Aguardando download...")
-        async with page.expect_download() as download_info:
-            await page.wait_for_timeout(5000)  # Espera o download iniciar
+        async with step_timer.step("export: download"):
+            async with page.expect_download(timeout=DOWNLOAD_TIMEOUT) as download_info:
+                await excel_option.click()
             download = await download_info.value
             
-            # Cria pasta Google Drive se não existir
-            drive_folder = "Google Drive"
-            if not os.path.exists(drive_folder):
-                os.makedirs(drive_folder)
-                print(f"Pasta {drive_folder} criada")
-            
-            # Salva o arquivo na pasta Google Drive com timestamp e nome do domínio
-            now = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_name = f"backlinks_{domain}_{now}.xlsx"
-            file_path = os.path.join(drive_folder, file_name)
-            
+            file_path = backlinks_file_path(domain)
             await download.save_as(file_path)
-            print(f"Download concluído: {file_path}")
-            
-            return file_path
+        add_file_bytes(file_path)
+        print(f"Download concluído: {file_path}")
+        
+        if API_MODE:
+            await export_replayer.finish_recording(page, download, domain)
+        
+        return file_path
             
     except Exception as e:
+        # Cada tentativa passa por aqui; o diagnóstico fica para report_domain_error, depois da última
         print(f"\nERRO ao baixar Excel: {str(e)}")
-        await page.screenshot(path="debug/download_error.png")
-        print("Screenshot do erro salvo em debug/download_error.png")
         raise
 
-async def upload_to_cleaner(page, excel_file):
-    """Faz upload do arquivo Excel para o limpador de domínios"""
-    try:
-        print("\n=== Fazendo upload para o limpador de domínios ===")
-        
-        # Acessa a página do limpador
-        print("Acessando página do limpador...")
-        await page.goto("https://limpar-dominio.vercel.app/", timeout=60000)
-        await page.wait_for_load_state('networkidle')
-        
-        # Faz upload do arquivo
-        print("Fazendo upload do arquivo...")
-        input_file = await page.wait_for_selector('input[type="file"]')
-        await input_file.set_input_files(excel_file)
-        
-        # Aguarda um tempo para o processamento
-        print("Aguardando processamento...")
-        await page.wait_for_timeout(10000)  # Espera 10 segundos
-        
-        print("Upload concluído!")
-        
-    except Exception as e:
-        print(f"\nERRO ao fazer upload: {str(e)}")
-        await page.screenshot(path="debug/cleaner_error.png")
-        print("Screenshot do erro salvo em debug/cleaner_error.png")
-        raise
+def get_artifact_store():
+    """Abre o armazenamento de exportações por hash"""
+    global artifact_store
+    if artifact_store is None:
+        artifact_store = ArtifactStore(
+            ARTIFACT_STORE_DIR,
+            compression=ARTIFACT_COMPRESSION,
+            convert=ARTIFACT_CONVERT,
+            keep_versions=ARTIFACT_KEEP_VERSIONS,
+            max_age_days=ARTIFACT_MAX_AGE_DAYS,
+        )
+    return artifact_store
+
+def restore_artifact(path):
+    """Recria a cópia legível de uma exportação armazenada, para retomar um domínio interrompido"""
+    if not ARTIFACT_STORE:
+        return None
+    return get_artifact_store().reopen(path)
 
-async def upload_to_verifier(page, excel_file):
-    """Faz upload do arquivo Excel para o verificador de domínios e espera o processamento"""
+async def store_export(file_path, domain):
+    """Guarda a exportação por hash; retorna um caminho legível para os próximos passos"""
+    if not ARTIFACT_STORE:
+        return file_path
+    store = get_artifact_store()
+    async with step_timer.step("export: armazenamento"):
+        version, is_new = await asyncio.to_thread(store.put, domain, file_path)
+        readable = await asyncio.to_thread(store.open_path, version)
+    if is_new:
+        print(f"Exportação de {domain} armazenada ({version['size']} → {version['stored_size']} bytes)")
+    else:
+        print(f"Exportação de {domain} idêntica a uma versão já armazenada, cópia descartada")
+    return readable
+
+def get_backlink_index():
+    """Abre o índice de impressões digitais dos backlinks"""
+    global backlink_index
+    if backlink_index is None:
+        backlink_index = BacklinkIndex(BACKLINK_INDEX_DB)
+    return backlink_index
+
+async def extract_delta(file_path, domain):
+    """Retorna (arquivo para limpar, fração que mudou)
+
+    O arquivo tem só os backlinks novos, é o export inteiro na primeira vez ou None sem novidades.
+    """
+    if not INCREMENTAL_DELTAS:
+        return file_path, None
+    now = datetime.now().strftime("%Y%m%d_%H%M%S")
+    delta_path = os.path.join("Google Drive", f"backlinks_novos_{domain}_{now}.csv")
+    async with step_timer.step("delta: comparação"):
+        delta = await asyncio.to_thread(get_backlink_index().compute_delta, domain, file_path, delta_path)
+    if delta.first_run:
+        print(f"Primeira exportação de {domain}: {delta.total} backlinks indexados")
+        return (file_path if delta.total else None), None
+    print(f"{domain}: {delta.added} backlinks novos, {delta.lost} perdidos (de {delta.total})")
+    if not delta.added:
+        if delta.delta_path:
+            os.remove(delta.delta_path)
+        return None, delta.change_ratio
+    return delta.delta_path, delta.change_ratio
+
+def get_referring_index():
+    """Abre o índice de domínios de referência"""
+    global referring_index
+    if referring_index is None:
+        referring_index = ReferringIndex(REFERRING_INDEX_DB)
+    return referring_index
+
+async def commit_delta(file_path, domain):
+    """Grava as impressões digitais da exportação; só depois dos estágios seguintes darem certo"""
+    if not INCREMENTAL_DELTAS or not file_path:
+        return
+    await asyncio.to_thread(get_backlink_index().commit, domain, file_path)
+
+async def index_referring_domains(file_path, domain):
+    """Registra os domínios de referência da exportação; uma falha aqui não derruba o domínio"""
+    if not REFERRING_INDEX or not file_path:
+        return
     try:
-        print("\n=== Fazendo upload para o verificador de domínios ===")
-        
-        # Acessa a página do verificador
-        print("Acessando página do verificador...")
-        await page.goto("https://verificador-dominios-v4.vercel.app/", timeout=60000)
-        await page.wait_for_load_state('networkidle')
-        
-        # Faz upload do arquivo
-        print("Fazendo upload do arquivo...")
-        input_file = await page.wait_for_selector('input[type="file"]')
-        await input_file.set_input_files(excel_file)
-        
-        # Aguarda o processamento inicial
-        print("Aguardando processamento inicial...")
-        await page.wait_for_timeout(5000)
-        
-        # Espera pelo texto de processamento concluído
-        print("Aguardando conclusão do processamento...")
-        await page.wait_for_selector('text=Processamento concluído!', timeout=300000)
-        print("Processamento concluído detectado!")
-        
-        # Aguarda mais alguns segundos para garantir que o link está clicável
-        await page.wait_for_timeout(2000)
-        
-        # Procura pelo link de download
-        print("Procurando link de download...")
-        download_link = await page.wait_for_selector('a.download-button', timeout=30000)
-        
-        if download_link:
-            print("Link de download encontrado, baixando arquivo...")
-            
-            # Clica e espera o download
-            async with page.expect_download() as download_info:
-                await download_link.click()
-                download = await download_info.value
-                
-                # Salva o arquivo processado
-                processed_file = "dominios_verificados.xlsx"
-                await download.save_as(processed_file)
-                print(f"Arquivo processado salvo como: {processed_file}")
-                
-                return processed_file
-        else:
-            print("Link de download não encontrado!")
-            await page.screenshot(path="debug/no_download_link.png")
-            return None
-            
+        async with step_timer.step("índice: domínios de referência"):
+            count = await asyncio.to_thread(get_referring_index().add_export, domain, file_path)
+        print(f"{count} domínios de referência de {domain} indexados")
     except Exception as e:
-        print(f"\nERRO ao fazer upload: {str(e)}")
-        await page.screenshot(path="debug/verifier_error.png")
-        print("Screenshot do erro salvo em debug/verifier_error.png")
-        raise
+        print(f"Erro ao indexar domínios de referência de {domain}: {str(e)}")
+
+async def clean_locally(file_path, domain):
+    """Limpa a exportação localmente, fora do loop de eventos"""
+    print("\n=== Limpando domínios localmente ===")
+    now = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = os.path.join("Google Drive", f"dominios_limpos_{domain}_{now}.xlsx")
+    async with step_timer.step("cleaner: local"):
+        total, unique = await asyncio.to_thread(clean_backlinks, file_path, output_path, exclude=[domain])
+    print(f"{total} backlinks lidos, {unique} domínios únicos gravados em {output_path}")
+    return output_path
+
+def get_dns_resolver():
+    """Cria o resolvedor DNS na primeira verificação, já dentro do loop do asyncio.run"""
+    global dns_resolver
+    if dns_resolver is None:
+        dns_resolver = SystemResolver()
+    return dns_resolver
+
+async def verify_locally(cleaned_path, domain):
+    """Verifica a disponibilidade dos domínios limpos por DNS"""
+    print("\n=== Verificando disponibilidade localmente ===")
+    now = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = os.path.join(os.path.dirname(cleaned_path), f"dominios_verificados_{domain}_{now}.xlsx")
+    async with step_timer.step("verifier: local"):
+        counts = await verify_file(
+            cleaned_path, output_path, get_dns_resolver(), concurrency=VERIFIER_CONCURRENCY, cache=verification_cache
+        )
+    print(f"Verificação concluída ({counts}): {output_path}")
+    return output_path
+
+async def open_backlinks_page(page, domain):
+    """Abre o relatório do domínio e espera a aba Backlinks ficar pronta"""
+    print("Acessando página de backlinks...")
+    async with step_timer.step("backlinks: página"):
+        await page.goto(f"{SEMRUSH_BASE_URL}/analytics/backlinks/backlinks/?q={domain}&searchType=domain", timeout=TIMEOUT)
+        await page.wait_for_load_state("networkidle")
+    print("Página carregada com sucesso!")
+    
+    # Clica na aba Backlinks
+    print("Clicando na aba Backlinks...")
+    backlinks_tab = await page.wait_for_selector('a[data-test="backlinks-tab"]', timeout=TIMEOUT)
+    if not backlinks_tab:
+        raise Exception("Aba Backlinks não encontrada")
+    await backlinks_tab.click()
+    
+    # A aba está pronta quando o botão Export aparece
+    async with step_timer.step("backlinks: aba"):
+        await page.wait_for_selector(EXPORT_BUTTON_SELECTOR, state="visible", timeout=TIMEOUT)
 
+@instrumentation.traced("get_backlinks", domain_arg=1)
 async def get_backlinks(page, domain):
     """Verifica backlinks para um domínio específico"""
+    capture = None
     try:
         print(f"\n=== Verificando backlinks para {domain} ===")
         
-        # Acessa a página de backlinks
-        print("Acessando página de backlinks...")
-        for attempt in range(MAX_RETRIES):
-            try:
-                print(f"Tentativa {attempt + 1} de {MAX_RETRIES}...")
-                await page.goto(f"https://smr.seopacktools.com/analytics/backlinks/backlinks/?q={domain}&searchType=domain", timeout=TIMEOUT)
-                await page.wait_for_load_state("networkidle")
-                print("Página carregada com sucesso!")
-                break
-            except Exception as e:
-                print(f"Erro ao carregar página: {str(e)}")
-                if attempt == MAX_RETRIES - 1:
-                    raise
-                await page.wait_for_timeout(5000)
-        
-        # Clica na aba Backlinks
-        print("Clicando na aba Backlinks...")
-        backlinks_tab = await page.wait_for_selector('a[data-test="backlinks-tab"]', timeout=TIMEOUT)
-        if not backlinks_tab:
-            raise Exception("Aba Backlinks não encontrada")
-        await backlinks_tab.click()
-        await page.wait_for_timeout(5000)
+        # Com a exportação já gravada, uma requisição HTTP substitui a interface
+        if API_MODE and not STREAM_MODE and export_replayer.ready:
+            file_path = await fetch_backlinks_api(domain)
+            if file_path:
+                return file_path
+        
+        # No modo streaming, escuta as respostas JSON desde a navegação
+        capture = XhrCapture(page, BACKLINKS_XHR_PATTERN).start() if STREAM_MODE else None
+        
+        # Acessa a página de backlinks, com novas tentativas conforme o tipo de erro
+        await resilience.call("navegação", lambda: open_backlinks_page(page, domain), page=page)
+        
+        if capture:
+            # Grava as linhas das respostas da tabela, sem passar pela exportação
+            async with step_timer.step("backlinks: streaming"):
+                file_path = await stream_backlinks(page, capture, backlinks_file_path(domain, STREAM_FORMAT), timeout=TIMEOUT)
+            add_file_bytes(file_path)
+            print("Processo de backlinks concluído!")
+            return file_path
         
         # Baixa o arquivo Excel
-        file_path = await download_backlinks_excel(page, domain)
+        file_path = await resilience.call("exportação", lambda: download_backlinks_excel(page, domain), page=page)
         print(f"Arquivo baixado com sucesso: {file_path}")
         
         print("Processo de backlinks concluído!")
+        return file_path
         
     except Exception as e:
+        if capture:
+            capture.stop()
+        # O screenshot, quando útil, fica por conta de report_domain_error
         print(f"\nERRO ao verificar backlinks para {domain}: {str(e)}")
-        print(f"URL atual: {page.url}")
-        await page.screenshot(path=f"debug/backlinks_error_{domain}.png")
-        print(f"Screenshot do erro salvo em debug/backlinks_error_{domain}.png")
         raise
 
 def load_domains():
@@ -485,131 +650,313 @@ def load_domains():
         print(f"Erro ao ler arquivo de domínios: {str(e)}")
         raise
 
-def remove_domain_from_list(domain):
-    """Remove um domínio da lista após processamento bem sucedido"""
-    try:
-        # Lê todas as linhas do arquivo
-        with open('domains.txt', 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Remove o domínio processado
-        with open('domains.txt', 'w', encoding='utf-8') as f:
-            for line in lines:
-                if line.strip() != domain:
-                    f.write(line)
-        
-        print(f"Domínio {domain} removido da lista")
-    except Exception as e:
-        print(f"Erro ao remover domínio da lista: {str(e)}")
-
 async def launch(headless=False):
-    """Inicia o navegador usando Playwright"""
-    playwright = await async_playwright().start()
-    return await playwright.chromium.launch(headless=headless)
+    """Inicia o navegador (ou conecta ao servidor persistente) com reciclagem de páginas e contextos"""
+    manager = BrowserManager(
+        headless=headless,
+        server_url=BROWSER_SERVER,
+        recycle_pages_after=RECYCLE_PAGE_AFTER,
+        recycle_context_after=RECYCLE_CONTEXT_AFTER,
+        rss_limit_mb=BROWSER_RSS_LIMIT_MB,
+        rss_min_domains=BROWSER_RSS_MIN_DOMAINS,
+        context_factory=new_context,
+    )
+    await manager.start()
+    return manager
 
-def load_domain_history():
-    """Carrega o histórico de domínios processados"""
-    try:
-        if os.path.exists('domain_history.json'):
-            with open('domain_history.json', 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"Erro ao carregar histórico: {str(e)}")
-        return {}
+def get_history_store():
+    """Abre o histórico em SQLite, importando o domain_history.json antigo na primeira vez"""
+    global history_store
+    if history_store is None:
+        history_store = HistoryStore(HISTORY_DB, recheck_interval=RECHECK_INTERVAL)
+        try:
+            history_store.import_json(LEGACY_HISTORY_FILE)
+        except Exception as e:
+            print(f"Erro ao importar histórico antigo: {str(e)}")
+    return history_store
 
-def save_domain_history(history):
-    """Salva o histórico de domínios processados"""
+def update_domain_history(domain, change=None):
+    """Atualiza o histórico com um domínio processado e agenda a próxima verificação"""
     try:
-        with open('domain_history.json', 'w') as f:
-            json.dump(history, f, indent=2)
+        store = get_history_store()
+        previous = store.get(domain)
+        now = datetime.now()
+        elapsed = 0
+        if previous and previous["last_check"]:
+            elapsed = (now - datetime.strptime(previous["last_check"], HISTORY_DATE_FORMAT)).total_seconds()
+        rate, interval = scheduler.observe(previous and previous["change_rate"], change, elapsed)
+        store.record(domain, status='success', checked_at=now, interval=interval, change_rate=rate, change=change)
     except Exception as e:
         print(f"Erro ao salvar histórico: {str(e)}")
 
-def update_domain_history(domain):
-    """Atualiza o histórico com um domínio processado"""
-    history = load_domain_history()
-    history[domain] = {
-        'last_check': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'status': 'success'
-    }
-    save_domain_history(history)
+def get_run_planner():
+    """Cria o planejador com o prazo contado a partir da primeira chamada"""
+    global run_planner
+    if run_planner is None:
+        run_planner = RunPlanner(
+            RUN_TIME_BUDGET.total_seconds(),
+            CostModel(RUN_COSTS_FILE, default_cost=DOMAIN_COST_ESTIMATE),
+            ProgressJournal(RUN_JOURNAL_FILE, restore=restore_artifact),
+            parallelism=CONCURRENT_WORKERS,
+        )
+    return run_planner
+
+def configure_shard(name):
+    """Usa a conta do shard e arquivos próprios de sessão, histórico, fila e diário"""
+    global SHARD_NAME, SEOPACK_LOGIN, SEOPACK_PASSWORD, session_cache
+    global SESSION_FILE, HISTORY_DB, QUEUE_DB, RUN_JOURNAL_FILE, RUN_COSTS_FILE, BACKLINK_INDEX_DB, REFERRING_INDEX_DB
+    accounts = accounts_from_config(globals())
+    if name not in accounts:
+        raise Exception(f"Shard {name} não está em SEOPACK_ACCOUNTS ({', '.join(accounts)})")
+    SHARD_NAME = name
+    SEOPACK_LOGIN, SEOPACK_PASSWORD = accounts[name]
+    SESSION_FILE = shard_file(SESSION_FILE, name)
+    session_cache = SessionCache(SESSION_FILE, SESSION_MAX_AGE)
+    HISTORY_DB = shard_file(HISTORY_DB, name)
+    QUEUE_DB = shard_file(QUEUE_DB, name)
+    RUN_JOURNAL_FILE = shard_file(RUN_JOURNAL_FILE, name)
+    RUN_COSTS_FILE = shard_file(RUN_COSTS_FILE, name)
+    BACKLINK_INDEX_DB = shard_file(BACKLINK_INDEX_DB, name)
+    REFERRING_INDEX_DB = shard_file(REFERRING_INDEX_DB, name)
+    instrumentation.log_path = shard_file(METRICS_LOG, name)
+    instrumentation.prom_path = shard_file(METRICS_PROM_FILE, name)
+    print(f"Shard {name}: conta {SEOPACK_LOGIN}, histórico em {HISTORY_DB}")
 
 def get_domains_to_check():
     """Retorna lista de domínios que precisam ser verificados"""
-    history = load_domain_history()
+    store = get_history_store()
     domains = load_domains()
+    if SHARD_NAME:
+        # Cada domínio pertence a um único shard; os recém-chegados trazem o histórico combinado
+        domains = assign_domains(domains, list(accounts_from_config(globals())))[SHARD_NAME]
+        store.flush()
+        seeded = seed_history(HISTORY_DB, MERGED_HISTORY_DB, domains)
+        if seeded:
+            print(f"{seeded} domínios trazidos do histórico combinado")
+    store.sync_domains(domains)
+    planner = get_run_planner()
+    
+    # Nunca verificados primeiro, depois os que mais devem ter mudado, até caber no tempo da execução
+    return plan(store.due_candidates(), scheduler, planner.budget(), planner.wall_cost)
+
+async def process_domain(page, domain):
+    """Processa um domínio isoladamente; erros não interrompem os demais"""
+    try:
+        print(f"\nProcessando domínio: {domain}")
+        file_path = await store_export(await get_backlinks(page, domain), domain)
+        delta_path, change = await extract_delta(file_path, domain)
+        await index_referring_domains(file_path, domain)
+        if delta_path:
+            cleaned_path = await clean_locally(delta_path, domain)
+            await verify_locally(cleaned_path, domain)
+        await commit_delta(file_path, domain)
+        print(f"Domínio {domain} processado com sucesso!")
+        
+        # Atualiza o histórico
+        update_domain_history(domain, change)
+        return True
+        
+    except Exception as e:
+        await report_domain_error(page, domain, e)
+        return False
+
+async def report_domain_error(page, domain, e):
+    """Registra a falha de um domínio sem interromper os demais"""
+    print(f"\nERRO ao verificar backlinks para {domain}: {str(e)}")
+    print(f"URL atual: {page.url}")
+    # Timeouts, sessão expirada e limite de requisições não dependem do que está na tela
+    if classify_error(e, page.url) in (SELECTOR_MISSING, UNKNOWN):
+        await diagnostics.capture(page, "backlinks", e, domain=domain)
+    print("Continuando com o próximo domínio...")
+
+def build_pipeline(browsers, limiter, planner=None):
+    """Monta o pipeline coleta → limpeza → verificação → publicação
+
+    Com o planejador, cada estágio concluído vai para o diário e é pulado ao retomar o domínio.
+    """
+    async def scrape(worker, item):
+        await limiter.wait()
+        page = await browsers.acquire(worker)
+        await diagnostics.begin_domain(page.context, item["domain"])
+        ok = False
+        try:
+            item["export"] = await get_backlinks(page, item["domain"])
+            ok = True
+        except Exception as e:
+            await report_domain_error(page, item["domain"], e)
+            raise
+        finally:
+            await diagnostics.end_domain(page.context, item["domain"], ok)
+            await browsers.release(worker)
+        return item
+    
+    async def clean(worker, item):
+        original_name = os.path.basename(item["export"])
+        item["export"] = await store_export(item["export"], item["domain"])
+        # O armazenamento nomeia pelo hash; no Drive vale o nome da exportação (com a extensão do arquivo guardado)
+        item["export_name"] = os.path.splitext(original_name)[0] + os.path.splitext(item["export"])[1]
+        # Sem backlinks novos não há o que limpar nem verificar
+        delta_path, item["change"] = await extract_delta(item["export"], item["domain"])
+        await index_referring_domains(item["export"], item["domain"])
+        item["cleaned"] = await clean_locally(delta_path, item["domain"]) if delta_path else None
+        return item
     
-    # Domínios que nunca foram verificados
-    new_domains = [d for d in domains if d not in history]
+    async def verify(worker, item):
+        if item["cleaned"]:
+            item["verified"] = await verify_locally(item["cleaned"], item["domain"])
+        return item
     
-    # Domínios que precisam ser rechecados (mais de 7 dias)
-    recheck_domains = []
-    for domain in domains:
-        if domain in history:
-            last_check = datetime.strptime(history[domain]['last_check'], '%Y-%m-%d %H:%M:%S')
-            if datetime.now() - last_check > timedelta(days=7):
-                recheck_domains.append(domain)
+    async def publish(worker, item):
+        if PUBLISH_TO_DRIVE:
+            # Os workers do publicador fazem o envio; uma falha derruba o estágio e o domínio volta para a fila
+            if item.get("verified"):
+                upload_path, upload_name = item["verified"], None
+            else:
+                upload_path, upload_name = item["export"], item.get("export_name")
+            async with instrumentation.span("upload_to_drive", domain=item["domain"]), step_timer.step("drive: upload"):
+                await get_drive_publisher().submit(upload_path, upload_name)
+                add_file_bytes(upload_path)
+        # Só agora os backlinks novos deixam de ser novos; se algo antes falhou, a próxima tentativa os repete
+        await commit_delta(item["export"], item["domain"])
+        update_domain_history(item["domain"], item.get("change"))
+        print(f"Domínio {item['domain']} processado com sucesso!")
+        return item
     
-    return new_domains + recheck_domains
+    stages = [
+        ("coleta", scrape, len(browsers.pages)),
+        ("limpeza", clean, CLEAN_CONCURRENCY),
+        ("verificação", verify, VERIFY_CONCURRENCY),
+        # Com o Drive, cada worker de publicação espera um upload; um por worker do publicador
+        ("publicação", publish, max(PUBLISH_CONCURRENCY, DRIVE_UPLOAD_WORKERS) if PUBLISH_TO_DRIVE else PUBLISH_CONCURRENCY),
+    ]
+    names = [name for name, _, _ in stages]
+    if planner is not None:
+        stages = [(name, planner.journaled(names, index, handler), concurrency)
+                  for index, (name, handler, concurrency) in enumerate(stages)]
+    return Pipeline([
+        Stage(name, handler, concurrency=concurrency, queue_size=PIPELINE_QUEUE_SIZE)
+        for name, handler, concurrency in stages
+    ])
+
+def get_work_queue():
+    """Abre a fila persistente de domínios"""
+    global work_queue
+    if work_queue is None:
+        work_queue = WorkQueue(
+            QUEUE_DB,
+            lease_seconds=QUEUE_LEASE_SECONDS,
+            max_attempts=MAX_RETRIES,
+            dead_cooldown=QUEUE_DEAD_COOLDOWN.total_seconds(),
+        )
+    return work_queue
+
+def close_stores():
+    """Fecha os bancos SQLite; o último fechamento aplica o WAL ao arquivo .db"""
+    global history_store, work_queue, backlink_index, referring_index
+    for name, store in (
+        ("histórico", history_store),
+        ("fila", work_queue),
+        ("impressões digitais", backlink_index),
+        ("domínios de referência", referring_index),
+    ):
+        if store is None:
+            continue
+        try:
+            store.close()
+        except Exception as e:
+            print(f"Erro ao fechar o banco de {name}: {str(e)}")
+    history_store = work_queue = backlink_index = referring_index = None
+
+async def process_job(worker, job):
+    """Processa um domínio emprestado pela fila na página do worker"""
+    page = await browser_manager.acquire(worker)
+    await diagnostics.begin_domain(page.context, job.domain)
+    ok = False
+    try:
+        ok = await process_domain(page, job.domain)
+        return ok
+    finally:
+        await diagnostics.end_domain(page.context, job.domain, ok)
+        await browser_manager.release(worker)
 
 async def main():
     """Função principal"""
+    global browser_manager
     try:
         print("\n=== Iniciando script de verificação de backlinks ===")
         
-        # Carrega os domínios que precisam ser verificados
+        # Enfileira os domínios vencidos; falhas de execuções anteriores já estão na fila
         domains = get_domains_to_check()
-        if not domains:
+        queue = get_work_queue()
+        queue.enqueue_many(domains)  # na ordem do plano: os de maior valor saem primeiro
+        # Os interrompidos na execução anterior vêm primeiro: parte do trabalho já está feita
+        planner = get_run_planner()
+        unfinished = planner.unfinished()
+        if unfinished:
+            print(f"Retomando {len(unfinished)} domínios interrompidos: {', '.join(unfinished)}")
+            queue.enqueue_many(unfinished, priority=1)
+        counts = queue.counts()
+        if not counts.get('pending') and not counts.get('leased'):
             print("Nenhum domínio precisa ser verificado no momento")
             return
             
-        print(f"Domínios para verificação: {domains}")
+        print(f"Domínios vencidos: {len(domains)} | fila: {counts}")
         
         # Inicializa o navegador
-        browser = await launch(headless=False)
-        context = await browser.new_context()
-        page = await context.new_page()
-        
-        # Faz login no SEOPack
-        await login_seopack(page)
-        
-        # Acessa o SEMrush
-        await access_semrush(page)
-        
-        # Processa cada domínio
-        for domain in domains:
-            try:
-                print(f"\nProcessando domínio: {domain}")
-                await get_backlinks(page, domain)
-                print(f"Domínio {domain} processado com sucesso!")
-                
-                # Atualiza o histórico
-                update_domain_history(domain)
-                
-                # Aguarda um tempo entre os domínios
-                print(f"Aguardando {DELAY_BETWEEN_REQUESTS} segundos antes do próximo domínio...")
-                await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
-                
-            except Exception as e:
-                print(f"\nERRO ao verificar backlinks para {domain}: {str(e)}")
-                print(f"URL atual: {page.url}")
-                await page.screenshot(path=f"debug/backlinks_error_{domain}.png")
-                print(f"Screenshot do erro salvo em debug/backlinks_error_{domain}.png")
-                print("Continuando com o próximo domínio...")
-                continue
+        browser_manager = await launch(headless=False)
+        
+        # Reaproveita a sessão salva ou faz login no SEOPack e no SEMrush
+        context, page = await open_session(browser_manager.browser)
+        
+        # Uma página por worker no mesmo contexto já logado; o contexto pode ser trocado durante a execução
+        await browser_manager.adopt(context, CONCURRENT_WORKERS, page)
+        resilience.relogin = lambda: relogin(browser_manager.context)
+        
+        # Processa os domínios em paralelo, com limite de taxa global
+        limiter = RateLimiter(DELAY_BETWEEN_REQUESTS)
+        # Para de pegar domínios perto do prazo e enquanto o disjuntor estiver aberto; espera as novas tentativas que couberem
+        source = GuardedSource(DeadlineSource(LeasedSource(queue, planner.spare_time), planner), resilience.breaker)
+        if PIPELINE_MODE:
+            # Enquanto um domínio é verificado, o navegador já coleta o próximo
+            domain_pipeline = build_pipeline(browser_manager, limiter, planner)
+            await domain_pipeline.run(source, lambda job: {"domain": job.domain})
+            get_history_store().flush()
+            domain_pipeline.report()
+        else:
+            stats = await run_worker_pool(list(range(CONCURRENT_WORKERS)), source, process_job, limiter)
+            get_history_store().flush()
+            print_worker_report(stats)
+        planner.cost_model.save()
+        planner.journal.compact()
+        step_timer.report()
+        instrumentation.report()
+        instrumentation.close()
+        resilience.report()
+        browser_manager.report()
+        diagnostics.report()
+        if NETWORK_BLOCKING:
+            network_policy.report()
+        await export_replayer.close()
+        await close_drive_publisher()
+        if ARTIFACT_STORE:
+            removed_versions, removed_objects, freed = get_artifact_store().apply_retention()
+            print(f"Retenção: {removed_versions} versões e {removed_objects} arquivos removidos ({freed} bytes)")
         
         print("\nProcessamento de todos os domínios concluído!")
         
-        # Fecha o navegador
-        await browser.close()
-        
     except Exception as e:
         print(f"\nErro durante a execução: {str(e)}")
         if 'page' in locals():
-            await page.screenshot(path="debug/main_error.png")
-            print("Screenshot do erro salvo em debug/main_error.png")
+            # Se a falha já foi registrada na etapa de origem, a assinatura repetida é ignorada
+            await diagnostics.capture(page, "main", e)
         raise
+    finally:
+        # Fecha o contexto, o navegador (se não for o servidor persistente) e o driver do Playwright
+        if browser_manager is not None:
+            await browser_manager.close()
+        close_stores()
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--shard":
+        configure_shard(sys.argv[2])
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Verificador local de disponibilidade de domínios por DNS assíncrono
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+from session_cache import atomic_write_json
+
+AVAILABLE = "Disponível"
+REGISTERED = "Registrado"
+ERROR = "Erro"
+
+
+class SystemResolver:
+    """Consulta NS com aiodns; sem aiodns, usa o getaddrinfo do sistema
+
+    Um NXDOMAIN indica que o domínio provavelmente está livre. Sem aiodns a
+    resposta é menos precisa: um domínio registrado sem registro A também
+    aparece como disponível. O resolvedor do aiodns é criado na primeira
+    consulta, preso ao loop em execução, e recriado se o loop mudar.
+    """
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        try:
+            import aiodns
+            self._aiodns = aiodns
+        except ImportError:
+            self._aiodns = None
+        self._resolver = None
+        self._loop = None
+
+    def _get_resolver(self):
+        loop = asyncio.get_running_loop()
+        if self._resolver is None or self._loop is not loop:
+            self._resolver = self._aiodns.DNSResolver(loop=loop, timeout=self.timeout, tries=2)
+            self._loop = loop
+        return self._resolver
+
+    async def check(self, domain):
+        if self._aiodns is not None:
+            try:
+                await self._get_resolver().query(domain, "NS")
+                return REGISTERED
+            except self._aiodns.error.DNSError as e:
+                code = e.args[0] if e.args else None
+                if code == self._aiodns.error.ARES_ENOTFOUND:
+                    return AVAILABLE
+                if code == self._aiodns.error.ARES_ENODATA:
+                    return REGISTERED
+                return ERROR
+
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(loop.getaddrinfo(domain, None), self.timeout)
+            return REGISTERED
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+                return AVAILABLE
+            return ERROR
+        except asyncio.TimeoutError:
+            return ERROR
+
+
+class StubResolver:
+    """Resolvedor local para testes: respostas fixas e latência opcional"""
+
+    def __init__(self, answers=None, default=REGISTERED, delay=0.0):
+        self.answers = answers or {}
+        self.default = default
+        self.delay = delay
+        self.calls = 0
+
+    async def check(self, domain):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.answers.get(domain, self.default)
+
+
+class ResultCache:
+    """Cache com validade dos resultados, persistido em JSON"""
+
+    def __init__(self, path="verification_cache.json", ttl=6 * 3600, error_ttl=300):
+        self.path = path
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._data = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except Exception as e:
+                print(f"Cache de verificação inválido, ignorando: {str(e)}")
+
+    def get(self, domain, now=None):
+        entry = self._data.get(domain)
+        if entry is None:
+            return None
+        status, checked_at = entry
+        ttl = self.error_ttl if status == ERROR else self.ttl
+        if (now or time.time()) - checked_at > ttl:
+            return None
+        return status
+
+    def set(self, domain, status, now=None):
+        self._data[domain] = [status, now or time.time()]
+        self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        now = time.time()
+        # Descarta o que já expirou para o arquivo não crescer sem limite
+        self._data = {
+            domain: entry for domain, entry in self._data.items()
+            if now - entry[1] <= (self.error_ttl if entry[0] == ERROR else self.ttl)
+        }
+        atomic_write_json(self.path, self._data)
+        self._dirty = False
+
+
+async def verify_domains(domains, resolver, concurrency=200, cache=None):
+    """Verifica os domínios em paralelo, limitado por concurrency
+
+    Retorna uma lista de (domínio, status) na ordem de entrada.
+    """
+    domains = list(domains)
+    results = [None] * len(domains)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(index, domain):
+        cached = cache.get(domain) if cache else None
+        if cached is not None:
+            results[index] = (domain, cached)
+            return
+        async with semaphore:
+            try:
+                status = await resolver.check(domain)
+            except Exception:
+                status = ERROR
+        if cache:
+            cache.set(domain, status)
+        results[index] = (domain, status)
+
+    await asyncio.gather(*(check(i, d) for i, d in enumerate(domains)))
+    if cache:
+        cache.save()
+    return results
+
+
+def read_domains(path):
+    """Lê a lista limpa (txt, csv ou xlsx com os domínios na primeira coluna)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(min_row=2, values_only=True)
+            return [str(row[0]).strip() for row in rows if row and row[0]]
+        finally:
+            workbook.close()
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip().split(",")[0] for line in f if line.strip()]
+    if extension == ".csv" and lines:
+        lines = lines[1:]
+    return lines
+
+
+def write_results(path, results):
+    """Grava a planilha no formato do dominios_verificados.xlsx"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Dominios")
+    sheet.append(["Domínio", "Status"])
+    for domain, status in results:
+        sheet.append([domain, status])
+    workbook.save(path)
+
+
+async def verify_file(input_path, output_path, resolver=None, concurrency=200, cache=None):
+    """Verifica a lista limpa e grava o resultado; retorna a contagem por status"""
+    resolver = resolver or SystemResolver()
+    results = await verify_domains(read_domains(input_path), resolver, concurrency, cache)
+    await asyncio.to_thread(write_results, output_path, results)
+    counts = {}
+    for _, status in results:
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python domain_verifier.py <lista_limpa> [dominios_verificados.xlsx]")
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) == 3 else "dominios_verificados.xlsx"
+    summary = asyncio.run(verify_file(sys.argv[1], target, cache=ResultCache()))
+    print(f"Resultado gravado em {target}: {summary}")
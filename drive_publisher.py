@@ -0,0 +1,290 @@
+"""
+Publicação assíncrona no Google Drive: fila, uploads retomáveis em partes e deduplicação
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from session_cache import atomic_write_json
+
+DRIVE_BASE_URL = "https://www.googleapis.com"
+CHUNK_SIZE = 8 * 1024 * 1024  # precisa ser múltiplo de 256 KiB
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class DriveUploadError(Exception):
+    """Falha definitiva no upload (após esgotar as tentativas)"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def google_token_provider(token_file="token.json", scopes=("https://www.googleapis.com/auth/drive.file",)):
+    """Retorna uma função que entrega um access token válido do token.json"""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
+    credentials = Credentials.from_authorized_user_file(token_file, list(scopes))
+
+    async def provide():
+        if not credentials.valid:
+            await asyncio.to_thread(credentials.refresh, Request())
+        return credentials.token
+
+    return provide
+
+
+class UploadLedger:
+    """Hashes já enviados e sessões retomáveis em andamento"""
+
+    def __init__(self, path="uploaded_hashes.json"):
+        self.path = path
+        self.uploaded = {}
+        self.sessions = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.uploaded = data.get("uploaded", {})
+                self.sessions = data.get("sessions", {})
+            except Exception as e:
+                print(f"Registro de uploads inválido, ignorando: {str(e)}")
+
+    def save(self):
+        atomic_write_json(self.path, {"uploaded": self.uploaded, "sessions": self.sessions})
+
+
+class DrivePublisher:
+    """Consome arquivos de uma fila e os envia com um número limitado de workers"""
+
+    def __init__(
+        self,
+        folder_id,
+        token_provider=None,
+        base_url=DRIVE_BASE_URL,
+        workers=2,
+        chunk_size=CHUNK_SIZE,
+        max_retries=5,
+        backoff_base=1.0,
+        ledger_path="uploaded_hashes.json",
+    ):
+        self.folder_id = folder_id
+        self.token_provider = token_provider
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.ledger = UploadLedger(ledger_path)
+        self.results = {}
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._client = None
+        self._ledger_lock = asyncio.Lock()
+        self._in_flight = {}
+
+    def start(self):
+        import httpx
+
+        self._client = httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=self.workers))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, path, name=None):
+        """Enfileira um arquivo; retorna um future com o id no Drive (ou None se duplicado)"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((path, name or os.path.basename(path), future))
+        return future
+
+    async def close(self):
+        """Espera a fila esvaziar e encerra os workers"""
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _worker(self):
+        while True:
+            path, name, future = await self._queue.get()
+            try:
+                file_id = await self.upload(path, name)
+                if not future.done():
+                    future.set_result(file_id)
+            except Exception as e:
+                print(f"ERRO no upload de {path} para o Drive: {str(e)}")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _headers(self, extra=None):
+        headers = dict(extra or {})
+        if self.token_provider is not None:
+            headers["Authorization"] = f"Bearer {await self.token_provider()}"
+        return headers
+
+    async def _request(self, method, url, **kwargs):
+        """Requisição com espera exponencial e jitter para 429, 5xx e erros de rede"""
+        import httpx
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._client.request(method, url, **kwargs)
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {str(e)}"
+            if attempt == self.max_retries:
+                raise DriveUploadError(f"{method} {url} falhou após {attempt + 1} tentativas ({error})")
+            delay = random.uniform(0, self.backoff_base * (2 ** attempt))
+            print(f"Upload: {error}, nova tentativa em {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def upload(self, path, name):
+        """Envia o arquivo, pulando conteúdo idêntico já publicado
+
+        Se o mesmo conteúdo já está sendo enviado, espera esse envio e
+        compartilha o resultado, inclusive a falha.
+        """
+        digest = await asyncio.to_thread(file_sha256, path)
+        if digest in self.ledger.uploaded:
+            print(f"{name} já publicado (mesmo conteúdo), upload ignorado")
+            self.results[path] = None
+            return None
+        if digest in self._in_flight:
+            print(f"{name} já está sendo enviado (mesmo conteúdo), aguardando esse upload")
+            file_id = await asyncio.shield(self._in_flight[digest])
+            self.results[path] = file_id
+            return file_id
+
+        flight = asyncio.get_running_loop().create_future()
+        self._in_flight[digest] = flight
+        try:
+            file_id = await self._upload_new(path, name, digest)
+            flight.set_result(file_id)
+            return file_id
+        except BaseException as e:
+            flight.set_exception(e if isinstance(e, Exception) else DriveUploadError("Upload cancelado"))
+            # Marca a exceção como lida: sem outro envio esperando, não vira aviso no fim do loop
+            flight.exception()
+            raise
+        finally:
+            self._in_flight.pop(digest, None)
+
+    async def _upload_new(self, path, name, digest):
+        total = os.path.getsize(path)
+        session_url = self.ledger.sessions.get(digest)
+        offset = await self._resume_offset(session_url, total) if session_url else None
+        if offset is None:
+            session_url = await self._start_session(name, total)
+            offset = 0
+            async with self._ledger_lock:
+                self.ledger.sessions[digest] = session_url
+                self.ledger.save()
+
+        file_id = await self._send_chunks(session_url, path, offset, total)
+        async with self._ledger_lock:
+            self.ledger.sessions.pop(digest, None)
+            self.ledger.uploaded[digest] = {
+                "name": name,
+                "file_id": file_id,
+                "uploaded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self.ledger.save()
+        print(f"Upload concluído: {name} ({total} bytes, id {file_id})")
+        self.results[path] = file_id
+        return file_id
+
+    async def _start_session(self, name, total):
+        url = f"{self.base_url}/upload/drive/v3/files?uploadType=resumable"
+        metadata = {"name": name, "parents": [self.folder_id]}
+        headers = await self._headers({
+            "Content-Type": "application/json; charset=UTF-8",
+            "X-Upload-Content-Length": str(total),
+        })
+        response = await self._request("POST", url, headers=headers, content=json.dumps(metadata))
+        if response.status_code != 200 or "location" not in response.headers:
+            raise DriveUploadError(f"Não foi possível abrir a sessão de upload (HTTP {response.status_code})")
+        return response.headers["location"]
+
+    async def _resume_offset(self, session_url, total):
+        """Pergunta ao Drive quantos bytes já chegaram; None se a sessão expirou"""
+        headers = await self._headers({"Content-Range": f"bytes */{total}"})
+        response = await self._request("PUT", session_url, headers=headers)
+        if response.status_code == 308:
+            return self._next_offset(response)
+        if response.status_code in (200, 201):
+            return total
+        return None
+
+    @staticmethod
+    def _next_offset(response):
+        received = response.headers.get("range")
+        if not received:
+            return 0
+        return int(received.rsplit("-", 1)[1]) + 1
+
+    def _read_chunk(self, f, offset):
+        f.seek(offset)
+        return f.read(self.chunk_size)
+
+    async def _send_chunks(self, session_url, path, offset, total):
+        resumes = 0
+        with open(path, "rb") as f:
+            while True:
+                # 8 MB do disco por vez: a leitura fica fora do loop de eventos
+                chunk = await asyncio.to_thread(self._read_chunk, f, offset)
+                end = offset + len(chunk) - 1
+                content_range = f"bytes {offset}-{end}/{total}" if chunk else f"bytes */{total}"
+                headers = await self._headers({"Content-Range": content_range})
+                try:
+                    response = await self._request("PUT", session_url, headers=headers, content=chunk)
+                except DriveUploadError:
+                    # A parte falhou de vez: pergunta ao Drive onde parou e continua dali
+                    resumes += 1
+                    resumed = await self._resume_offset(session_url, total) if resumes <= self.max_retries else None
+                    if resumed is None:
+                        raise
+                    offset = resumed
+                    continue
+
+                if response.status_code in (200, 201):
+                    return response.json().get("id")
+                if response.status_code == 308:
+                    offset = self._next_offset(response)
+                    continue
+                if response.status_code in (404, 410):
+                    raise DriveUploadError("Sessão de upload expirada")
+                raise DriveUploadError(f"Upload recusado (HTTP {response.status_code}): {response.text[:200]}")
+
+
+async def publish_files(paths, folder_id, **kwargs):
+    """Atalho para enviar uma lista de arquivos e esperar todos"""
+    publisher = DrivePublisher(folder_id, **kwargs)
+    publisher.start()
+    futures = [publisher.submit(path) for path in paths]
+    await publisher.close()
+    return [f.result() if not f.exception() else None for f in futures]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Uso: python drive_publisher.py <folder_id> <arquivo> [arquivo...]")
+        sys.exit(1)
+    started = time.monotonic()
+    ids = asyncio.run(publish_files(sys.argv[2:], sys.argv[1], token_provider=google_token_provider()))
+    print(f"{len(ids)} arquivos processados em {time.monotonic() - started:.1f}s: {ids}")
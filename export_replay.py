@@ -0,0 +1,172 @@
+"""
+Modo API: grava a requisição de exportação feita pela interface e a repete via HTTP
+"""
+
+import os
+
+DOMAIN_MARKER = "{{domain}}"
+
+# Cabeçalhos que o cliente HTTP precisa gerar por conta própria
+_SKIPPED_HEADERS = {"host", "content-length", "cookie", "connection", "accept-encoding"}
+
+
+class ExportReplayError(Exception):
+    """A repetição da exportação falhou e o domínio deve voltar ao navegador"""
+
+
+class ExportTemplate:
+    """Requisição de exportação com o domínio trocado por um marcador"""
+
+    def __init__(self, method, url_template, headers, body_template):
+        self.method = method
+        self.url_template = url_template
+        self.headers = headers
+        self.body_template = body_template
+
+    @classmethod
+    def from_request(cls, method, url, headers, body, domain):
+        """Cria o modelo a partir da requisição gravada; None se ela não depende do domínio"""
+        if url.startswith(("blob:", "data:")):
+            return None
+        url_template = url.replace(domain, DOMAIN_MARKER)
+        body_template = body.replace(domain, DOMAIN_MARKER) if body else None
+        if DOMAIN_MARKER not in url_template and DOMAIN_MARKER not in (body_template or ""):
+            return None
+        headers = {
+            name: value for name, value in headers.items()
+            if not name.startswith(":") and name.lower() not in _SKIPPED_HEADERS
+        }
+        return cls(method, url_template, headers, body_template)
+
+    def render(self, domain):
+        url = self.url_template.replace(DOMAIN_MARKER, domain)
+        body = self.body_template.replace(DOMAIN_MARKER, domain) if self.body_template else None
+        return url, body
+
+
+class ExportReplayer:
+    """Grava a exportação do primeiro domínio e repete para os seguintes"""
+
+    def __init__(self, max_connections=10, timeout=120, max_failures=3):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.template = None
+        self.enabled = True
+        self._client = None
+        self._cookies = []
+        self._failures = 0
+        self._captured = {}
+
+    @property
+    def ready(self):
+        return self.enabled and self.template is not None
+
+    def start_recording(self, page):
+        """Passa a guardar as requisições da página até finish_recording"""
+        if not self.enabled or self.template is not None:
+            return None
+        captured = []
+
+        def on_request(request):
+            captured.append(request)
+
+        page.on("request", on_request)
+        self._captured[id(page)] = (on_request, captured)
+        return captured
+
+    async def finish_recording(self, page, download, domain):
+        """Procura a requisição que gerou o download e monta o modelo"""
+        recording = self._captured.pop(id(page), None)
+        if recording is None:
+            return
+        on_request, captured = recording
+        page.remove_listener("request", on_request)
+        if self.template is not None:
+            return
+
+        request = next((r for r in reversed(captured) if r.url == download.url), None)
+        if request is None:
+            print("Modo API: requisição de exportação não identificada, mantendo o navegador")
+            return
+
+        template = ExportTemplate.from_request(
+            request.method, request.url, await request.all_headers(), request.post_data, domain
+        )
+        if template is None:
+            print("Modo API: exportação não pode ser repetida (URL não depende do domínio)")
+            self.enabled = False
+            return
+
+        self.template = template
+        await self.update_cookies(page.context)
+        print(f"Modo API: exportação gravada ({template.method} {template.url_template})")
+
+    async def update_cookies(self, context):
+        """Copia os cookies do contexto logado (ex.: depois de um novo login)"""
+        self._cookies = await context.cookies()
+        if self._client is not None:
+            self._apply_cookies(self._client)
+
+    def _apply_cookies(self, client):
+        client.cookies.clear()
+        for cookie in self._cookies:
+            client.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+            self._apply_cookies(self._client)
+        return self._client
+
+    async def fetch(self, domain, file_path):
+        """Baixa a exportação direto por HTTP, gravando em streaming no disco"""
+        try:
+            client = self._get_client()
+        except ImportError:
+            print("Modo API: httpx não instalado, usando o navegador")
+            self.enabled = False
+            raise ExportReplayError("httpx não instalado")
+
+        url, body = self.template.render(domain)
+        tmp_path = file_path + ".part"
+        try:
+            async with client.stream(self.template.method, url, headers=self.template.headers, content=body) as response:
+                content_type = response.headers.get("content-type", "")
+                if response.status_code != 200:
+                    raise ExportReplayError(f"status HTTP {response.status_code}")
+                if "text/html" in content_type:
+                    # Normalmente é a página de login: a sessão expirou
+                    raise ExportReplayError("resposta HTML em vez da planilha")
+
+                with open(tmp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(64 * 1024):
+                        f.write(chunk)
+
+            with open(tmp_path, "rb") as f:
+                if f.read(2) != b"PK":
+                    raise ExportReplayError("arquivo recebido não é um xlsx")
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                print(f"Modo API desativado após {self._failures} falhas seguidas")
+                self.enabled = False
+            if isinstance(e, ExportReplayError):
+                raise
+            raise ExportReplayError(str(e)) from e
+
+        self._failures = 0
+        return file_path
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,180 @@
+"""
+Histórico de domínios verificados em SQLite, indexado pela próxima verificação
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    domain TEXT PRIMARY KEY,
+    last_check TEXT,
+    status TEXT,
+    next_due REAL NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_history_due ON history(next_due) WHERE active = 1;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS checks (
+    domain TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    change REAL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_domain ON checks(domain, checked_at);
+"""
+
+# Colunas acrescentadas depois da primeira versão do banco
+MIGRATIONS = {
+    "change_rate": "ALTER TABLE history ADD COLUMN change_rate REAL",
+    "interval": "ALTER TABLE history ADD COLUMN interval REAL",
+}
+
+
+class HistoryStore:
+    """Guarda a última verificação de cada domínio e quando ele vence de novo"""
+
+    def __init__(self, path="domain_history.db", recheck_interval=timedelta(days=7), batch_size=20):
+        self.path = path
+        self.recheck_interval = recheck_interval
+        self.batch_size = batch_size
+        self._pending = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(history)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(statement)
+        self.conn.commit()
+
+    def import_json(self, json_path="domain_history.json"):
+        """Importa o domain_history.json antigo uma única vez"""
+        if not os.path.exists(json_path):
+            return 0
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return 0
+
+        with open(json_path, "r") as f:
+            history = json.load(f)
+
+        rows = []
+        for domain, entry in history.items():
+            last_check = datetime.strptime(entry["last_check"], DATE_FORMAT)
+            next_due = (last_check + self.recheck_interval).timestamp()
+            rows.append((domain, entry["last_check"], entry.get("status"), next_due))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO history (domain, last_check, status, next_due) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_imported', ?)",
+                (datetime.now().strftime(DATE_FORMAT),),
+            )
+        print(f"{len(rows)} domínios importados de {json_path}")
+        return len(rows)
+
+    def sync_domains(self, domains):
+        """Cadastra domínios novos e marca como inativos os que saíram da lista"""
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (domain TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM wanted")
+            self.conn.executemany("INSERT OR IGNORE INTO wanted (domain) VALUES (?)", ((d,) for d in domains))
+            self.conn.execute("INSERT OR IGNORE INTO history (domain, next_due) SELECT domain, 0 FROM wanted")
+            self.conn.execute(
+                "UPDATE history SET active = 0 WHERE active = 1 AND domain NOT IN (SELECT domain FROM wanted)"
+            )
+            self.conn.execute(
+                "UPDATE history SET active = 1 WHERE active = 0 AND domain IN (SELECT domain FROM wanted)"
+            )
+
+    def due_domains(self, now=None, limit=None):
+        """Domínios ativos vencidos, nunca verificados primeiro"""
+        now = now or datetime.now()
+        query = "SELECT domain FROM history WHERE active = 1 AND next_due <= ? ORDER BY next_due"
+        params = [now.timestamp()]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def due_candidates(self, now=None):
+        """Domínios vencidos com o necessário para priorizá-los: (domínio, última verificação, taxa de mudança)"""
+        now = now or datetime.now()
+        rows = self.conn.execute(
+            "SELECT domain, last_check, change_rate FROM history WHERE active = 1 AND next_due <= ? ORDER BY next_due",
+            (now.timestamp(),),
+        )
+        return [
+            (domain, datetime.strptime(last_check, DATE_FORMAT) if last_check else None, change_rate)
+            for domain, last_check, change_rate in rows
+        ]
+
+    def record(self, domain, status="success", checked_at=None, interval=None, change_rate=None, change=None):
+        """Registra uma verificação; o commit acontece em lotes
+
+        interval substitui o recheck_interval fixo quando o agendador adaptativo calcula um;
+        change (fração do perfil que mudou) vai para o log usado na simulação.
+        """
+        checked_at = checked_at or datetime.now()
+        interval = interval or self.recheck_interval
+        next_due = (checked_at + interval).timestamp()
+        self.conn.execute(
+            """
+            INSERT INTO history (domain, last_check, status, next_due, change_rate, interval)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(domain) DO UPDATE SET
+                last_check = excluded.last_check,
+                status = excluded.status,
+                next_due = excluded.next_due,
+                change_rate = COALESCE(excluded.change_rate, history.change_rate),
+                interval = excluded.interval
+            """,
+            (domain, checked_at.strftime(DATE_FORMAT), status, next_due, change_rate, interval.total_seconds()),
+        )
+        self.conn.execute(
+            "INSERT INTO checks (domain, checked_at, change) VALUES (?, ?, ?)",
+            (domain, checked_at.timestamp(), change),
+        )
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def get(self, domain):
+        row = self.conn.execute(
+            "SELECT last_check, status, next_due, change_rate FROM history WHERE domain = ?", (domain,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "last_check": row[0],
+            "status": row[1],
+            "next_due": datetime.fromtimestamp(row[2]),
+            "change_rate": row[3],
+        }
+
+    def check_log(self):
+        """Todas as verificações registradas, por domínio e em ordem: {domínio: [(timestamp, mudança)]}"""
+        log = {}
+        for domain, checked_at, change in self.conn.execute(
+            "SELECT domain, checked_at, change FROM checks ORDER BY domain, checked_at"
+        ):
+            log.setdefault(domain, []).append((checked_at, change))
+        return log
+
+    def flush(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
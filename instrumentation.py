@@ -0,0 +1,173 @@
+"""
+Spans leves em volta das etapas principais, com log JSONL e arquivo de métricas para o Prometheus
+"""
+
+import contextvars
+import functools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from pipeline import percentile
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Uma execução de uma etapa; bytes e novas tentativas sobem para os spans pais"""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.error = None
+
+    def chain(self):
+        span = self
+        while span is not None:
+            yield span
+            span = span.parent
+
+
+def add_bytes(count):
+    """Soma bytes transferidos ao span atual (e aos que o contêm)"""
+    span = _current_span.get()
+    if span is not None and count:
+        for item in span.chain():
+            item.bytes += count
+
+
+def add_file_bytes(path):
+    if path and os.path.exists(path):
+        add_bytes(os.path.getsize(path))
+
+
+def add_retry():
+    """Conta uma nova tentativa no span atual (e nos que o contêm)"""
+    span = _current_span.get()
+    if span is not None:
+        for item in span.chain():
+            item.retries += 1
+
+
+class Instrumentation:
+    """Registra os spans concluídos e resume latência, bytes e novas tentativas por etapa"""
+
+    def __init__(self, log_path="debug/metrics.jsonl", prom_path="debug/backlinks.prom", prefix="backlinks"):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.prefix = prefix
+        self.durations = defaultdict(list)
+        self.bytes = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._log = None
+
+    def _write(self, span):
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log.write(json.dumps({
+            "span": span.name,
+            "parent": span.parent.name if span.parent else None,
+            "start": datetime.fromtimestamp(span.started_at).isoformat(timespec="milliseconds"),
+            "duration": round(span.duration, 4),
+            "bytes": span.bytes,
+            "retries": span.retries,
+            "error": span.error,
+            **span.attributes,
+        }, ensure_ascii=False) + "\n")
+        self._log.flush()
+
+    @asynccontextmanager
+    async def span(self, name, **attributes):
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        started = time.monotonic()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.monotonic() - started
+            _current_span.reset(token)
+            self.durations[name].append(span.duration)
+            self.bytes[name] += span.bytes
+            self.retries[name] += span.retries
+            if span.error:
+                self.errors[name] += 1
+            self._write(span)
+
+    def traced(self, name=None, domain_arg=None):
+        """Decorador: envolve a corrotina num span; domain_arg é a posição do argumento domínio"""
+        def decorate(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                attributes = {}
+                if domain_arg is not None and len(args) > domain_arg:
+                    attributes["domain"] = args[domain_arg]
+                async with self.span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def write_prometheus(self):
+        """Grava o arquivo no formato do textfile collector (substituição atômica)"""
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_span_duration_seconds Duração das etapas do verificador de backlinks",
+            f"# TYPE {prefix}_span_duration_seconds summary",
+        ]
+        for name, values in sorted(self.durations.items()):
+            for quantile in (0.5, 0.95):
+                lines.append(f'{prefix}_span_duration_seconds{{span="{name}",quantile="{quantile}"}} {percentile(values, quantile):.6f}')
+            lines.append(f'{prefix}_span_duration_seconds_sum{{span="{name}"}} {sum(values):.6f}')
+            lines.append(f'{prefix}_span_duration_seconds_count{{span="{name}"}} {len(values)}')
+        for metric, values, help_text in (
+            ("span_bytes_total", self.bytes, "Bytes transferidos por etapa"),
+            ("span_retries_total", self.retries, "Novas tentativas por etapa"),
+            ("span_errors_total", self.errors, "Falhas por etapa"),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for name in sorted(self.durations):
+                lines.append(f'{prefix}_{metric}{{span="{name}"}} {values[name]}')
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {time.time():.0f}")
+
+        os.makedirs(os.path.dirname(self.prom_path) or ".", exist_ok=True)
+        temp_path = self.prom_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prom_path)
+
+    def report(self):
+        """Imprime p50/p95 por etapa e grava o arquivo do Prometheus"""
+        if not self.durations:
+            return
+        print("\n=== Latência por etapa ===")
+        print(f"{'Etapa':<26} {'N':>4} {'p50':>8} {'p95':>8} {'Erros':>6} {'Retries':>8} {'Bytes':>12}")
+        for name, values in sorted(self.durations.items(), key=lambda item: sum(item[1]), reverse=True):
+            print(
+                f"{name:<26} {len(values):>4} {percentile(values, 0.5):>7.2f}s {percentile(values, 0.95):>7.2f}s "
+                f"{self.errors[name]:>6} {self.retries[name]:>8} {self.bytes[name]:>12}"
+            )
+        self.write_prometheus()
+        print(f"Métricas gravadas em {self.log_path} e {self.prom_path}")
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
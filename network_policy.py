@@ -0,0 +1,130 @@
+"""
+Política de bloqueio de requisições aplicada ao contexto do navegador
+"""
+
+import re
+from collections import Counter
+
+# Tipos de recurso que a automação nunca usa
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Rastreadores, analytics e widgets de chat
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googleadservices\.com",
+    r"connect\.facebook\.net",
+    r"facebook\.com/tr",
+    r"hotjar\.(com|io)",
+    r"clarity\.ms",
+    r"mc\.yandex\.",
+    r"intercom(cdn)?\.(io|com)",
+    r"widget\.intercom\.io",
+    r"tawk\.to",
+    r"crisp\.chat",
+    r"zopim\.com",
+    r"zdassets\.com",
+    r"jivosite\.com",
+    r"(cdn\.)?segment\.(io|com)",
+    r"fullstory\.com",
+    r"amplitude\.com",
+    r"mixpanel\.com",
+    r"sentry\.io",
+)
+
+# Tamanho típico da resposta por tipo de recurso, para estimar o que o bloqueio economiza
+# enquanto nenhuma resposta do mesmo tipo foi medida
+TYPICAL_RESPONSE_BYTES = {
+    "image": 40 * 1024,
+    "media": 500 * 1024,
+    "font": 60 * 1024,
+    "script": 80 * 1024,
+    "stylesheet": 30 * 1024,
+    "document": 60 * 1024,
+    "xhr": 4 * 1024,
+    "fetch": 4 * 1024,
+}
+DEFAULT_RESPONSE_BYTES = 10 * 1024
+
+# O que o fluxo de exportação precisa, mesmo se casar com alguma regra acima
+DEFAULT_ALLOWED_URL_PATTERNS = (
+    r"export",
+    r"download",
+    r"\.xlsx?(\?|$)",
+)
+
+
+class NetworkPolicy:
+    """Bloqueia requisições por tipo de recurso e padrão de URL, com allowlist"""
+
+    def __init__(
+        self,
+        blocked_resource_types=DEFAULT_BLOCKED_RESOURCE_TYPES,
+        blocked_url_patterns=DEFAULT_BLOCKED_URL_PATTERNS,
+        allowed_url_patterns=DEFAULT_ALLOWED_URL_PATTERNS,
+    ):
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self._blocked_urls = re.compile("|".join(blocked_url_patterns), re.I) if blocked_url_patterns else None
+        self._allowed_urls = re.compile("|".join(allowed_url_patterns), re.I) if allowed_url_patterns else None
+        self.blocked = Counter()
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+        # Bytes e respostas medidos por tipo de recurso, base da estimativa dos bloqueados
+        self._measured_bytes = Counter()
+        self._measured_responses = Counter()
+
+    def block_reason(self, url, resource_type):
+        """Retorna o motivo do bloqueio, ou None se a requisição deve seguir"""
+        if self._allowed_urls and self._allowed_urls.search(url):
+            return None
+        if resource_type in self.blocked_resource_types:
+            return f"tipo:{resource_type}"
+        if self._blocked_urls and self._blocked_urls.search(url):
+            return "url"
+        return None
+
+    async def install(self, context):
+        """Instala a política em todas as páginas do contexto"""
+        await context.route("**/*", self._handle_route)
+        context.on("response", self._on_response)
+
+    def estimate_bytes(self, resource_type, headers=None):
+        """Bytes que uma requisição bloqueada teria trafegado: corpo enviado mais a resposta esperada"""
+        sent = (headers or {}).get("content-length", "")
+        measured = self._measured_responses[resource_type]
+        if measured:
+            expected = self._measured_bytes[resource_type] // measured
+        else:
+            expected = TYPICAL_RESPONSE_BYTES.get(resource_type, DEFAULT_RESPONSE_BYTES)
+        return expected + (int(sent) if sent.isdigit() else 0)
+
+    async def _handle_route(self, route):
+        request = route.request
+        reason = self.block_reason(request.url, request.resource_type)
+        if reason:
+            self.blocked[reason] += 1
+            self.blocked_requests += 1
+            self.blocked_bytes += self.estimate_bytes(request.resource_type, request.headers)
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    def _on_response(self, response):
+        self.allowed_requests += 1
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.allowed_bytes += int(length)
+            resource_type = response.request.resource_type
+            self._measured_bytes[resource_type] += int(length)
+            self._measured_responses[resource_type] += 1
+
+    def report(self):
+        """Imprime quantas requisições foram bloqueadas, quanto isso economizou e quanto tráfego passou"""
+        print("\n=== Bloqueio de rede ===")
+        print(f"Requisições bloqueadas: {self.blocked_requests} (~{self.blocked_bytes / 1024 / 1024:.1f} MB evitados, estimados)")
+        for reason, count in self.blocked.most_common():
+            print(f"  {reason}: {count}")
+        print(f"Requisições permitidas: {self.allowed_requests} ({self.allowed_bytes / 1024 / 1024:.1f} MB declarados)")
@@ -0,0 +1,125 @@
+"""
+Pipeline em estágios com filas limitadas entre eles (coleta → limpeza → verificação → publicação)
+"""
+
+import asyncio
+import time
+
+_DONE = object()
+
+
+def percentile(values, fraction):
+    """Percentil simples (vizinho mais próximo)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Stage:
+    """Estágio do pipeline: handler(worker_index, item) retorna o item para o próximo estágio"""
+
+    def __init__(self, name, handler, concurrency=1, queue_size=2):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        # Capacidade da fila de entrada; fila cheia segura o estágio anterior (backpressure)
+        self.queue_size = queue_size
+
+
+class StageStats:
+    """Latência e profundidade de fila de um estágio"""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.latencies = []
+        self.waits = []
+        self.depth_samples = []
+
+
+class Pipeline:
+    """Executa os estágios em paralelo; o primeiro consome uma fonte take()/finish()"""
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.stats = [StageStats(stage.name) for stage in stages]
+        self.elapsed = 0.0
+
+    async def run(self, source, make_item):
+        """make_item(job) cria o dicionário que atravessa os estágios"""
+        self._source = source
+        self._make_item = make_item
+        self._queues = [None] + [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages[1:]]
+        started = time.monotonic()
+        await asyncio.gather(*(self._run_stage(index) for index in range(len(self.stages))))
+        self.elapsed = time.monotonic() - started
+        return self.stats
+
+    async def _run_stage(self, index):
+        stage = self.stages[index]
+        await asyncio.gather(*(self._worker(index, worker) for worker in range(stage.concurrency)))
+        # Avisa cada worker do estágio seguinte que não virá mais nada
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].concurrency):
+                await self._queues[index + 1].put(_DONE)
+
+    async def _next(self, index):
+        if index == 0:
+            job = await self._source.take()
+            if job is None:
+                return None
+            return {"job": job, "enqueued_at": time.monotonic()}
+        queue = self._queues[index]
+        self.stats[index].depth_samples.append(queue.qsize())
+        envelope = await queue.get()
+        return None if envelope is _DONE else envelope
+
+    async def _worker(self, index, worker):
+        stage = self.stages[index]
+        stats = self.stats[index]
+        while True:
+            envelope = await self._next(index)
+            if envelope is None:
+                break
+            stats.waits.append(time.monotonic() - envelope["enqueued_at"])
+            if index == 0:
+                envelope["item"] = self._make_item(envelope["job"])
+
+            started = time.monotonic()
+            try:
+                envelope["item"] = await stage.handler(worker, envelope["item"])
+            except Exception as e:
+                stats.failed += 1
+                stats.latencies.append(time.monotonic() - started)
+                print(f"[{stage.name}] Falha em {envelope['job']}: {str(e)}")
+                await self._source.finish(envelope["job"], False)
+                continue
+            stats.latencies.append(time.monotonic() - started)
+            stats.processed += 1
+
+            if index + 1 < len(self.stages):
+                envelope["enqueued_at"] = time.monotonic()
+                await self._queues[index + 1].put(envelope)
+            else:
+                await self._source.finish(envelope["job"], True)
+
+    def report(self):
+        """Resumo por estágio: latência, espera na fila e profundidade"""
+        print("\n=== Resumo do pipeline ===")
+        print(
+            f"{'Estágio':<12} {'OK':>5} {'Erro':>5} {'p50':>8} {'p95':>8} "
+            f"{'Espera p50':>11} {'Fila média':>11} {'Fila máx':>9}"
+        )
+        for stats in self.stats:
+            depth = stats.depth_samples
+            print(
+                f"{stats.name:<12} {stats.processed:>5} {stats.failed:>5} "
+                f"{percentile(stats.latencies, 0.5):>7.2f}s {percentile(stats.latencies, 0.95):>7.2f}s "
+                f"{percentile(stats.waits, 0.5):>10.2f}s "
+                f"{(sum(depth) / len(depth) if depth else 0):>11.2f} {max(depth, default=0):>9}"
+            )
+        done = self.stats[-1].processed
+        if self.elapsed > 0:
+            print(f"{done} domínios concluídos em {self.elapsed:.1f}s ({done * 60 / self.elapsed:.2f}/min)")
@@ -0,0 +1,299 @@
+"""
+Índice invertido domínio de referência → domínios monitorados, com primeira e última vez visto
+
+Uso: python referring_index.py <índice.db> <comando> [argumentos]
+  add <domínio> <exportação>        indexa uma exportação
+  build <exportação> [...]          indexa backlinks_<domínio>_<AAAAMMDD_HHMMSS>.* (ex.: "Google Drive/backlinks_*")
+  targets <domínio_de_referência>   domínios monitorados que recebem links dele
+  referrers <domínio> [--ativos]    domínios de referência de um domínio monitorado
+  new <dias> [domínio]              domínios de referência vistos pela primeira vez nos últimos dias
+  shared [mínimo] [limite]          domínios de referência que linkam vários domínios monitorados
+  merge <outro.db> [...]            junta índices de outros shards
+  stats
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from backlink_cleaner import find_source_column, iter_rows, registrable_domain
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    targets INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS links (
+    referring_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    backlinks INTEGER NOT NULL,
+    PRIMARY KEY (referring_id, target_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_links_target ON links(target_id, last_seen);
+CREATE INDEX IF NOT EXISTS idx_links_first_seen ON links(first_seen);
+CREATE INDEX IF NOT EXISTS idx_domains_targets ON domains(targets) WHERE targets > 1;
+CREATE TABLE IF NOT EXISTS exports (
+    target_id INTEGER NOT NULL,
+    indexed_at INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    referring INTEGER NOT NULL,
+    PRIMARY KEY (target_id, indexed_at)
+) WITHOUT ROWID;
+"""
+
+EXPORT_NAME = re.compile(r"backlinks_(?P<domain>.+)_(?P<stamp>\d{8}_\d{6})\.")
+
+_UPSERT_LINK = """
+INSERT INTO links (referring_id, target_id, first_seen, last_seen, backlinks)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(referring_id, target_id) DO UPDATE SET
+    first_seen = min(links.first_seen, excluded.first_seen),
+    last_seen = max(links.last_seen, excluded.last_seen),
+    backlinks = CASE WHEN excluded.last_seen >= links.last_seen THEN excluded.backlinks ELSE links.backlinks END
+"""
+
+
+class ReferringLink:
+    """Um par domínio de referência ↔ domínio monitorado"""
+
+    def __init__(self, referring, target, first_seen, last_seen, backlinks):
+        self.referring = referring
+        self.target = target
+        self.first_seen = datetime.fromtimestamp(first_seen)
+        self.last_seen = datetime.fromtimestamp(last_seen)
+        self.backlinks = backlinks
+
+    def __repr__(self):
+        return (
+            f"{self.referring} → {self.target}: {self.backlinks} backlinks, "
+            f"de {self.first_seen:%Y-%m-%d} a {self.last_seen:%Y-%m-%d}"
+        )
+
+
+class ReferringIndex:
+    """Domínios de referência de todas as exportações, com ids inteiros no lugar dos nomes"""
+
+    def __init__(self, path="referring_domains.db"):
+        self.path = path
+        # Chamado de threads (asyncio.to_thread); o lock serializa o acesso
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _ids(self, names):
+        """Id de cada nome, criando os que faltam num único INSERT ... SELECT"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_names (name TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM batch_names")
+        self.conn.executemany("INSERT OR IGNORE INTO batch_names (name) VALUES (?)", ((name,) for name in names))
+        self.conn.execute("INSERT OR IGNORE INTO domains (name) SELECT name FROM batch_names")
+        return dict(self.conn.execute(
+            "SELECT d.name, d.id FROM batch_names b JOIN domains d ON d.name = b.name"
+        ))
+
+    def _recount(self, referring_ids=None):
+        """Atualiza quantos domínios monitorados cada domínio de referência linka"""
+        query = "UPDATE domains SET targets = (SELECT COUNT(*) FROM links WHERE referring_id = domains.id)"
+        if referring_ids is None:
+            self.conn.execute(query)
+            return
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM batch_ids")
+        self.conn.executemany("INSERT INTO batch_ids (id) VALUES (?)", ((i,) for i in referring_ids))
+        self.conn.execute(query + " WHERE id IN (SELECT id FROM batch_ids)")
+
+    def add_export(self, target, export_path, seen_at=None):
+        """Indexa os domínios de referência de uma exportação do domínio monitorado
+
+        Só o domínio de referência e a contagem de backlinks entram no índice;
+        linhas repetidas da mesma exportação atualizam o mesmo par.
+        """
+        seen_at = int(seen_at if seen_at is not None else time.time())
+        rows = iter_rows(export_path)
+        header = next(rows, None)
+        if header is None:
+            # Exportação vazia: nada a indexar, e o que já está no índice continua valendo
+            return 0
+        source_column = find_source_column(list(header))
+        counts = Counter()
+        total = 0
+        for row in rows:
+            total += 1
+            referring = registrable_domain(row[source_column]) if source_column < len(row) else None
+            if referring:
+                counts[referring] += 1
+
+        with self.lock, self.conn:
+            target_id = self._ids([target])[target]
+            ids = self._ids(counts)
+            self.conn.executemany(
+                _UPSERT_LINK,
+                ((ids[name], target_id, seen_at, seen_at, count) for name, count in counts.items()),
+            )
+            self._recount(ids.values())
+            self.conn.execute(
+                "INSERT OR REPLACE INTO exports (target_id, indexed_at, rows, referring) VALUES (?, ?, ?, ?)",
+                (target_id, seen_at, total, len(counts)),
+            )
+        return len(counts)
+
+    def _links(self, where, params, order="l.last_seen DESC", limit=None):
+        query = f"""
+            SELECT r.name, t.name, l.first_seen, l.last_seen, l.backlinks
+            FROM links l
+            JOIN domains r ON r.id = l.referring_id
+            JOIN domains t ON t.id = l.target_id
+            WHERE {where}
+            ORDER BY {order}
+        """
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self.lock:
+            return [ReferringLink(*row) for row in self.conn.execute(query, params)]
+
+    def targets_for(self, referring):
+        """Domínios monitorados que recebem links do domínio de referência"""
+        return self._links("l.referring_id = (SELECT id FROM domains WHERE name = ?)", (referring,))
+
+    def referrers_for(self, target, active_only=False):
+        """Domínios de referência do domínio monitorado; ativos são os da exportação mais recente"""
+        where = "l.target_id = (SELECT id FROM domains WHERE name = ?)"
+        if active_only:
+            where += " AND l.last_seen = (SELECT MAX(indexed_at) FROM exports WHERE target_id = l.target_id)"
+        return self._links(where, (target,), order="l.backlinks DESC")
+
+    def new_since(self, since, target=None, limit=1000):
+        """Pares vistos pela primeira vez desde since (datetime)"""
+        where = "l.first_seen >= ?"
+        params = [int(since.timestamp())]
+        if target:
+            where += " AND l.target_id = (SELECT id FROM domains WHERE name = ?)"
+            params.append(target)
+        return self._links(where, params, order="l.first_seen DESC", limit=limit)
+
+    def shared(self, min_targets=2, limit=100):
+        """Domínios de referência que linkam pelo menos min_targets domínios monitorados: [(nome, quantos)]"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT name, targets FROM domains WHERE targets >= ? AND targets > 1 ORDER BY targets DESC LIMIT ?",
+                (max(min_targets, 2), limit),
+            ).fetchall()
+
+    def merge_from(self, other_path):
+        """Junta outro índice (ex.: de outro shard), casando os domínios pelo nome"""
+        with self.lock:
+            self.conn.execute("ATTACH DATABASE ? AS other", (other_path,))
+            try:
+                with self.conn:
+                    self.conn.execute("INSERT OR IGNORE INTO domains (name) SELECT name FROM other.domains")
+                    self.conn.execute(
+                        """
+                        CREATE TEMP TABLE id_map AS
+                        SELECT o.id AS other_id, d.id AS id FROM other.domains o JOIN main.domains d ON d.name = o.name
+                        """
+                    )
+                    self.conn.execute(
+                        """
+                        INSERT INTO links (referring_id, target_id, first_seen, last_seen, backlinks)
+                        SELECT r.id, t.id, l.first_seen, l.last_seen, l.backlinks
+                        FROM other.links l
+                        JOIN id_map r ON r.other_id = l.referring_id
+                        JOIN id_map t ON t.other_id = l.target_id
+                        WHERE true
+                        ON CONFLICT(referring_id, target_id) DO UPDATE SET
+                            first_seen = min(links.first_seen, excluded.first_seen),
+                            last_seen = max(links.last_seen, excluded.last_seen),
+                            backlinks = CASE WHEN excluded.last_seen >= links.last_seen
+                                        THEN excluded.backlinks ELSE links.backlinks END
+                        """
+                    )
+                    self.conn.execute(
+                        """
+                        INSERT OR IGNORE INTO exports (target_id, indexed_at, rows, referring)
+                        SELECT t.id, e.indexed_at, e.rows, e.referring
+                        FROM other.exports e JOIN id_map t ON t.other_id = e.target_id
+                        """
+                    )
+                    self.conn.execute("DROP TABLE temp.id_map")
+                    self._recount()
+            finally:
+                self.conn.execute("DETACH DATABASE other")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "domínios": self.conn.execute("SELECT COUNT(*) FROM domains").fetchone()[0],
+                "monitorados": self.conn.execute("SELECT COUNT(DISTINCT target_id) FROM exports").fetchone()[0],
+                "pares": self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0],
+                "exportações": self.conn.execute("SELECT COUNT(*) FROM exports").fetchone()[0],
+            }
+
+    def close(self):
+        self.conn.close()
+
+
+def _print_links(links):
+    for link in links:
+        print(link)
+    print(f"({len(links)} resultados)")
+
+
+def _build(index, paths):
+    for path in paths:
+        match = EXPORT_NAME.search(os.path.basename(path))
+        if not match:
+            print(f"Ignorado (nome fora do padrão backlinks_<domínio>_<data>): {path}")
+            continue
+        seen_at = datetime.strptime(match["stamp"], "%Y%m%d_%H%M%S").timestamp()
+        try:
+            count = index.add_export(match["domain"], path, seen_at)
+        except Exception as e:
+            print(f"Erro ao indexar {path}: {str(e)}")
+            continue
+        print(f"{path}: {count} domínios de referência")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__.split("\n", 3)[3])
+        sys.exit(1)
+    index = ReferringIndex(sys.argv[1])
+    command, args = sys.argv[2], sys.argv[3:]
+    started = time.perf_counter()
+    if command == "add" and len(args) == 2:
+        print(f"{index.add_export(args[0], args[1])} domínios de referência indexados")
+    elif command == "build" and args:
+        _build(index, sorted(args))
+    elif command == "targets" and len(args) == 1:
+        _print_links(index.targets_for(args[0].lower()))
+    elif command == "referrers" and args:
+        _print_links(index.referrers_for(args[0], active_only="--ativos" in args))
+    elif command == "new" and args:
+        since = datetime.fromtimestamp(time.time() - float(args[0]) * 86400)
+        _print_links(index.new_since(since, args[1] if len(args) > 1 else None))
+    elif command == "shared":
+        for name, targets in index.shared(int(args[0]) if args else 2, int(args[1]) if len(args) > 1 else 100):
+            print(f"{name}: {targets} domínios monitorados")
+    elif command == "merge" and args:
+        for path in args:
+            if os.path.abspath(path) != os.path.abspath(index.path):
+                index.merge_from(path)
+                print(f"{path} combinado em {index.path}")
+    elif command == "stats":
+        for name, value in index.stats().items():
+            print(f"{name}: {value}")
+    else:
+        print(__doc__.split("\n", 3)[3])
+        sys.exit(1)
+    print(f"Tempo: {(time.perf_counter() - started) * 1000:.1f} ms")
+    index.close()
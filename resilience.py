@@ -0,0 +1,290 @@
+"""
+Classificação de erros, novas tentativas com espera exponencial e disjuntor para o scraper
+"""
+
+import asyncio
+import random
+import re
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+from instrumentation import add_retry
+
+TIMEOUT = "timeout"
+AUTH_EXPIRED = "sessão expirada"
+SELECTOR_MISSING = "seletor ausente"
+RATE_LIMITED = "limite de requisições"
+UNKNOWN = "outro"
+
+# Status e páginas de login vêm do status HTTP e do caminho da URL, não de trechos soltos da mensagem
+_AUTH_MARKERS = ("sessão expirada", "resposta html")
+_RATE_MARKERS = ("too many requests", "rate limit", "limite de requisi")
+_LOGIN_SEGMENTS = ("login", "signin", "entrar")
+_STATUS_PATTERN = re.compile(r"\b(?:status(?: http)?|http)[ :]+([1-5]\d\d)\b")
+_SELECTOR_MARKERS = ("waiting for selector", "waiting for locator", "não encontrad", "not found")
+
+
+class ClassifiedError(Exception):
+    """Erro de uma operação já classificado, depois de esgotadas as tentativas"""
+
+    def __init__(self, kind, operation, original):
+        super().__init__(f"{operation}: {kind} ({str(original)})")
+        self.kind = kind
+        self.operation = operation
+        self.original = original
+
+
+class CircuitOpenError(Exception):
+    """O disjuntor desarmou vezes demais; a execução deve parar"""
+
+
+def http_status(error):
+    """Status HTTP do erro: atributo dele ou da resposta, ou "status HTTP 401" na mensagem"""
+    for holder in (error, getattr(error, "response", None)):
+        for name in ("status", "status_code"):
+            value = getattr(holder, name, None)
+            if isinstance(value, int):
+                return value
+    match = _STATUS_PATTERN.search(str(error).lower())
+    return int(match.group(1)) if match else None
+
+
+def _is_login_page(page_url):
+    """Algum segmento do caminho é a página de login (não basta a palavra aparecer na URL)"""
+    if not page_url:
+        return False
+    return any(segment in _LOGIN_SEGMENTS for segment in urlparse(page_url).path.lower().split("/"))
+
+
+def classify_error(error, page_url=None):
+    """Timeout, sessão expirada, seletor ausente, limite de requisições ou outro"""
+    if isinstance(error, ClassifiedError):
+        return error.kind
+    status = http_status(error)
+    message = str(error).lower()
+    if status in (401, 403) or _is_login_page(page_url):
+        return AUTH_EXPIRED
+    if status == 429 or any(marker in message for marker in _RATE_MARKERS):
+        return RATE_LIMITED
+    if any(marker in message for marker in _AUTH_MARKERS):
+        return AUTH_EXPIRED
+    # Antes do timeout: no Playwright, o seletor que não aparece também é um TimeoutError
+    if any(marker in message for marker in _SELECTOR_MARKERS):
+        return SELECTOR_MISSING
+    if isinstance(error, asyncio.TimeoutError) or "timeout" in f"{type(error).__name__} {message}".lower():
+        return TIMEOUT
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """Quantas tentativas, quais tipos de erro repetir e quanto esperar entre elas"""
+
+    def __init__(
+        self,
+        max_attempts=3,
+        base_delay=2.0,
+        max_delay=60.0,
+        retry_on=(TIMEOUT, AUTH_EXPIRED, RATE_LIMITED, UNKNOWN),
+        rate_limit_factor=4,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Seletor ausente é mudança de layout: repetir não resolve
+        self.retry_on = set(retry_on)
+        self.rate_limit_factor = rate_limit_factor
+
+    def delay(self, attempt, kind):
+        """Espera exponencial com jitter completo; limite de requisições espera mais"""
+        ceiling = self.base_delay * (2 ** attempt)
+        if kind == RATE_LIMITED:
+            ceiling *= self.rate_limit_factor
+        return random.uniform(0, min(self.max_delay, ceiling))
+
+
+class CircuitBreaker:
+    """Abre quando a taxa de falhas recentes passa do limite e segura novas operações"""
+
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "meio-aberto"
+
+    def __init__(self, window=10, failure_threshold=0.6, min_calls=5, cooldown=120.0, max_trips=3):
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.state = self.CLOSED
+        self.trips = 0
+        self.opened_at = 0.0
+        self.paused = 0.0
+        self._trial_running = False
+        self._trial_id = 0
+
+    @property
+    def halted(self):
+        return self.trips > self.max_trips
+
+    def failure_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def _open(self, reason):
+        self.trips += 1
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        if self.halted:
+            print(f"Disjuntor desarmou {self.trips} vezes ({reason}), encerrando a execução")
+        else:
+            print(f"Disjuntor aberto ({reason}): pausa de {self.cooldown:.0f}s")
+
+    def release_trial(self, trial_id):
+        """Libera a vaga de teste de uma operação que terminou sem registrar resultado (ex.: cancelada)"""
+        if self._trial_id == trial_id:
+            self._trial_running = False
+
+    def record(self, ok):
+        if self.state == self.HALF_OPEN:
+            self._trial_running = False
+            if ok:
+                print("Disjuntor fechado: operação de teste bem-sucedida")
+                self.state = self.CLOSED
+                self.cooldown = self.base_cooldown
+                self.outcomes.clear()
+            else:
+                # A pausa dobra a cada teste que falha
+                self.cooldown *= 2
+                self._open("operação de teste falhou")
+            return
+        self.outcomes.append(ok)
+        if (
+            self.state == self.CLOSED
+            and len(self.outcomes) >= self.min_calls
+            and self.failure_rate() >= self.failure_threshold
+        ):
+            self._open(f"{self.failure_rate():.0%} de falhas nas últimas {len(self.outcomes)} operações")
+
+    async def wait(self, trial=True):
+        """Espera o disjuntor permitir a operação; no meio-aberto só uma operação de teste passa
+
+        Retorna o número da vaga de teste quando a operação ficou com ela, ou 0.
+        """
+        while True:
+            if self.halted:
+                raise CircuitOpenError(f"disjuntor desarmou {self.trips} vezes")
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                self.state = self.HALF_OPEN
+                self.paused += self.cooldown
+            if not trial:
+                return 0
+            if not self._trial_running:
+                self._trial_running = True
+                self._trial_id += 1
+                return self._trial_id
+            await asyncio.sleep(1)
+
+
+class Resilience:
+    """Executa operações com classificação de erro, novas tentativas, novo login e disjuntor"""
+
+    def __init__(self, policy=None, breaker=None, relogin=None):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        # async () -> None; definido depois que existe um contexto do navegador
+        self.relogin = relogin
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.retries = defaultdict(int)
+        self.relogins = 0
+        self._relogin_lock = asyncio.Lock()
+        self._session_generation = 0
+
+    async def call(self, operation, action, page=None):
+        """Executa action() (uma corrotina nova a cada tentativa) com a política de novas tentativas
+
+        O disjuntor recebe um único resultado por chamada, depois da última
+        tentativa: um domínio com erro conta uma falha, não uma por tentativa.
+        """
+        trial = 0
+        try:
+            for attempt in range(self.policy.max_attempts):
+                # Com a vaga de teste, as novas tentativas não esperam por ela de novo
+                trial = await self.breaker.wait(trial=not trial) or trial
+                generation = self._session_generation
+                try:
+                    result = await action()
+                except Exception as e:
+                    kind = classify_error(e, page.url if page is not None else None)
+                    self.errors[operation][kind] += 1
+                    last = attempt == self.policy.max_attempts - 1
+                    if kind not in self.policy.retry_on or last:
+                        self.breaker.record(False)
+                        raise ClassifiedError(kind, operation, e) from e
+                    if kind == AUTH_EXPIRED:
+                        await self._relogin(generation)
+                    delay = self.policy.delay(attempt, kind)
+                    self.retries[operation] += 1
+                    add_retry()
+                    print(f"[{operation}] {kind}: {str(e)[:120]} — tentativa {attempt + 2} em {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record(True)
+                return result
+        finally:
+            # Cancelada no meio do teste, a chamada não pode deixar o disjuntor preso no meio-aberto
+            if trial:
+                self.breaker.release_trial(trial)
+
+    async def _relogin(self, generation):
+        """Um único novo login para vários workers que encontraram a sessão expirada juntos"""
+        if self.relogin is None:
+            return
+        async with self._relogin_lock:
+            if generation != self._session_generation:
+                # Outro worker já renovou a sessão enquanto este esperava
+                return
+            print("Sessão expirada, fazendo login novamente...")
+            await self.relogin()
+            self._session_generation += 1
+            self.relogins += 1
+
+    def report(self):
+        """Erros por operação e tipo, novas tentativas e pausas do disjuntor"""
+        if not self.errors and not self.breaker.trips:
+            return
+        print("\n=== Resiliência ===")
+        for operation, kinds in self.errors.items():
+            detail = ", ".join(f"{kind}: {count}" for kind, count in kinds.items())
+            print(f"{operation:<14} {detail} | novas tentativas: {self.retries[operation]}")
+        print(
+            f"Novos logins: {self.relogins} | disjuntor: {self.breaker.trips} aberturas, "
+            f"{self.breaker.paused:.0f}s em pausa"
+        )
+
+
+class GuardedSource:
+    """Fonte que segura novos domínios enquanto o disjuntor está aberto e para se ele desistir"""
+
+    def __init__(self, source, breaker):
+        self.source = source
+        self.breaker = breaker
+
+    async def take(self):
+        try:
+            # A vaga de teste do meio-aberto fica para a operação do domínio, não para a fonte
+            await self.breaker.wait(trial=False)
+        except CircuitOpenError:
+            return None
+        return await self.source.take()
+
+    async def finish(self, job, ok):
+        await self.source.finish(job, ok)
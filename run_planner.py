@@ -0,0 +1,222 @@
+"""
+Planejamento da execução dentro do prazo, com diário de progresso para retomar domínios interrompidos
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from pipeline import percentile
+from session_cache import atomic_write_json
+
+FINISHED = "concluído"
+
+
+class ProgressJournal:
+    """Diário JSONL: uma linha por estágio concluído, gravada com fsync antes de seguir
+
+    restore(caminho) recria um arquivo do item que sumiu entre as execuções
+    (por exemplo, a cópia descomprimida de uma exportação armazenada) e
+    retorna o novo caminho, ou None se não houver como.
+    """
+
+    def __init__(self, path="run_journal.jsonl", restore=None):
+        self.path = path
+        self.restore = restore
+        self.progress = {}
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Última linha cortada pelo fim abrupto da execução anterior
+                    continue
+                if entry["stage"] == FINISHED:
+                    self.progress.pop(entry["domain"], None)
+                else:
+                    self.progress.setdefault(entry["domain"], {})[entry["stage"]] = entry["item"]
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, domain, stage, item, elapsed):
+        """Registra um estágio concluído com o estado do item nesse ponto"""
+        snapshot = {key: value for key, value in item.items() if isinstance(value, (str, int, float, type(None)))}
+        self.progress.setdefault(domain, {})[stage] = snapshot
+        self._append({
+            "domain": domain,
+            "stage": stage,
+            "item": snapshot,
+            "elapsed": round(elapsed, 3),
+            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def finish(self, domain):
+        """O domínio passou por todos os estágios; não há o que retomar"""
+        self.progress.pop(domain, None)
+        self._append({"domain": domain, "stage": FINISHED, "item": {}, "elapsed": 0})
+
+    def resume_point(self, domain, stage_names):
+        """Índice do último estágio concluído cujos arquivos existem ou podem ser recriados, e o item salvo nele"""
+        done = self.progress.get(domain, {})
+        for index in range(len(stage_names) - 1, -1, -1):
+            item = done.get(stage_names[index])
+            if item is not None:
+                item = self._restored(item)
+                if item is not None:
+                    return index, item
+        return -1, None
+
+    def _restored(self, item):
+        """Cópia do item com os arquivos conferidos; None se algum sumiu e não pôde ser recriado"""
+        restored = dict(item)
+        for key, value in item.items():
+            if key == "domain" or not _looks_like_path(value) or os.path.exists(value):
+                continue
+            path = self.restore(value) if self.restore is not None else None
+            if path is None:
+                return None
+            restored[key] = path
+        return restored
+
+    def compact(self):
+        """Reescreve o diário só com os domínios que ficaram pela metade"""
+        self._file.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for domain, stages in self.progress.items():
+                for stage, item in stages.items():
+                    f.write(json.dumps({"domain": domain, "stage": stage, "item": item, "elapsed": 0}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+def _looks_like_path(value):
+    return isinstance(value, str) and (os.sep in value or "/" in value)
+
+
+class CostModel:
+    """Tempo de cada estágio por domínio, em média móvel, para estimar execuções futuras"""
+
+    def __init__(self, path="run_costs.json", default_cost=120, alpha=0.5):
+        self.path = path
+        self.default_cost = default_cost
+        self.alpha = alpha
+        self.costs = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.costs = json.load(f)
+            except Exception as e:
+                print(f"Custos anteriores inválidos, ignorando: {str(e)}")
+
+    def observe(self, domain, stage, elapsed):
+        stages = self.costs.setdefault(domain, {})
+        previous = stages.get(stage)
+        stages[stage] = elapsed if previous is None else self.alpha * elapsed + (1 - self.alpha) * previous
+
+    def estimate(self, domain):
+        """Segundos previstos para o domínio, somando todos os estágios"""
+        known = self.costs.get(domain)
+        if known:
+            return sum(known.values())
+        totals = [sum(stage_costs.values()) for stage_costs in self.costs.values() if stage_costs]
+        # Domínio nunca medido: mediana dos demais, ou o padrão configurado
+        return percentile(totals, 0.5) if totals else self.default_cost
+
+    def save(self):
+        atomic_write_json(self.path, self.costs)
+
+
+class RunPlanner:
+    """Ordena e limita o trabalho para terminar antes do prazo"""
+
+    def __init__(self, deadline_seconds, cost_model, journal, parallelism=1, safety_margin=0.1):
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_seconds
+        self.cost_model = cost_model
+        self.journal = journal
+        self.parallelism = max(1, parallelism)
+        self.safety_margin = safety_margin
+
+    def time_left(self):
+        return self.deadline - time.monotonic()
+
+    def wall_cost(self, domain):
+        """Custo em tempo de relógio, já dividido entre as páginas em paralelo"""
+        return self.cost_model.estimate(domain) / self.parallelism
+
+    def unfinished(self):
+        """Domínios que uma execução anterior deixou pela metade"""
+        return list(self.journal.progress)
+
+    def budget(self):
+        """Segundos disponíveis para novos domínios, descontada a margem de segurança"""
+        return max(0.0, self.time_left() * (1 - self.safety_margin))
+
+    def spare_time(self):
+        """Segundos que sobram depois de mais um domínio: quanto dá para esperar por um job em espera"""
+        return self.budget() - self.wall_cost(None)
+
+    def has_time_for(self, domain=None):
+        """Ainda dá tempo de começar mais um domínio?"""
+        return self.budget() >= self.wall_cost(domain)
+
+    def journaled(self, stage_names, index, handler):
+        """Envolve o handler do estágio: pula o que o diário já tem e registra o que terminar"""
+        stage = stage_names[index]
+
+        async def run(worker, item):
+            domain = item["domain"]
+            # Recriar um arquivo pode exigir descomprimir a exportação inteira
+            resumed, saved = await asyncio.to_thread(self.journal.resume_point, domain, stage_names)
+            if index <= resumed:
+                item.update(saved)
+                print(f"[{stage}] {domain}: já concluído numa execução anterior, retomando")
+                return item
+            started = time.monotonic()
+            item = await handler(worker, item)
+            elapsed = time.monotonic() - started
+            self.cost_model.observe(domain, stage, elapsed)
+            if index == len(stage_names) - 1:
+                self.journal.finish(domain)
+                self.cost_model.save()
+            else:
+                self.journal.record(domain, stage, item, elapsed)
+            return item
+
+        return run
+
+
+class DeadlineSource:
+    """Fonte que para de entregar domínios quando não há mais tempo para processá-los"""
+
+    def __init__(self, source, planner):
+        self.source = source
+        self.planner = planner
+        self.stopped = False
+
+    async def take(self):
+        if not self.planner.has_time_for():
+            if not self.stopped:
+                print(f"Prazo da execução próximo ({self.planner.time_left():.0f}s restantes), sem novos domínios")
+                self.stopped = True
+            return None
+        return await self.source.take()
+
+    async def finish(self, job, ok):
+        await self.source.finish(job, ok)
@@ -0,0 +1,194 @@
+"""
+Agendamento das reverificações pela taxa de mudança de cada domínio, com simulação de políticas
+"""
+
+import heapq
+import math
+import sys
+from datetime import datetime, timedelta
+
+DAY = 86400
+WASTE_THRESHOLD = 0.001  # verificação que encontrou menos que isso de mudança foi desperdiçada
+
+
+class FixedPolicy:
+    """Intervalo fixo para todos os domínios (o comportamento antigo)"""
+
+    name = "fixo"
+
+    def __init__(self, interval=timedelta(days=7)):
+        self.interval = interval
+
+    def observe(self, previous_rate, change, elapsed):
+        """Retorna (taxa de mudança, próximo intervalo); a taxa não é usada aqui"""
+        return previous_rate, self.interval
+
+    def value(self, last_check, change_rate, now):
+        """Prioridade: quanto do intervalo já passou"""
+        if last_check is None:
+            return math.inf
+        return (now - last_check) / self.interval
+
+
+class AdaptiveScheduler:
+    """Intervalo inversamente proporcional à taxa de mudança (média móvel exponencial, por dia)"""
+
+    name = "adaptativo"
+
+    def __init__(
+        self,
+        base_interval=timedelta(days=7),
+        min_interval=timedelta(days=1),
+        max_interval=timedelta(days=30),
+        target_change=0.05,
+        alpha=0.3,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # Fração do perfil que se aceita deixar mudar antes de verificar de novo
+        self.target_change = target_change
+        self.alpha = alpha
+
+    def observe(self, previous_rate, change, elapsed):
+        """Atualiza a taxa com a mudança vista em elapsed segundos; retorna (taxa, próximo intervalo)"""
+        if change is None or elapsed <= 0:
+            return previous_rate, self.interval_for(previous_rate)
+        observed = change / (elapsed / DAY)
+        rate = observed if previous_rate is None else self.alpha * observed + (1 - self.alpha) * previous_rate
+        return rate, self.interval_for(rate)
+
+    def interval_for(self, rate):
+        if rate is None:
+            return self.base_interval
+        if rate <= 0:
+            return self.max_interval
+        interval = timedelta(days=self.target_change / rate)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def value(self, last_check, change_rate, now):
+        """Prioridade: fração do perfil que se espera ter mudado desde a última verificação"""
+        if last_check is None:
+            return math.inf
+        if change_rate is None:
+            # Sem histórico, assume a taxa que levaria ao intervalo base
+            change_rate = self.target_change / (self.base_interval / timedelta(days=1))
+        return min(1.0, change_rate * (now - last_check) / timedelta(days=1))
+
+
+def plan(candidates, policy, budget_seconds=None, cost=lambda domain: 0, now=None):
+    """Escolhe os candidatos de maior valor até esgotar o orçamento de tempo
+
+    candidates são tuplas (domínio, última verificação, taxa) como em HistoryStore.due_candidates.
+    """
+    now = now or datetime.now()
+    heap = [(-policy.value(last_check, rate, now), index, domain) for index, (domain, last_check, rate) in enumerate(candidates)]
+    heapq.heapify(heap)
+
+    selected = []
+    spent = 0.0
+    while heap:
+        _, _, domain = heapq.heappop(heap)
+        domain_cost = cost(domain)
+        if budget_seconds is not None and spent + domain_cost > budget_seconds:
+            # Outro domínio mais barato ainda pode caber no que sobrou
+            continue
+        selected.append(domain)
+        spent += domain_cost
+    return selected
+
+
+def _segments(entries):
+    """Taxa real por dia entre verificações consecutivas do log: [(início, fim, taxa)]"""
+    segments = []
+    for (start, _), (end, change) in zip(entries, entries[1:]):
+        if change is not None and end > start:
+            segments.append((start, end, change / ((end - start) / DAY)))
+    return segments
+
+
+def _changed_between(segments, start, end):
+    """Mudança acumulada entre start e end; fora do log repete a taxa do trecho mais próximo"""
+    total = 0.0
+    for index, (seg_start, seg_end, rate) in enumerate(segments):
+        if index == 0:
+            seg_start = -math.inf
+        if index == len(segments) - 1:
+            seg_end = math.inf
+        overlap = min(end, seg_end) - max(start, seg_start)
+        if overlap > 0:
+            total += rate * overlap / DAY
+    return min(1.0, total)
+
+
+def simulate(check_log, policy, checks_per_run, run_every=DAY, start=None, end=None):
+    """Reproduz o log de verificações com outra política e mede o custo e a defasagem"""
+    truth = {domain: _segments(entries) for domain, entries in check_log.items()}
+    truth = {domain: segments for domain, segments in truth.items() if segments}
+    if not truth:
+        return None
+    start = start or min(segments[0][0] for segments in truth.values())
+    end = end or max(segments[-1][1] for segments in truth.values())
+
+    state = {domain: {"last": start, "rate": None, "due": start} for domain in truth}
+    checks = wasted = 0
+    captured = 0.0
+    staleness = []
+    now = start
+    while now < end:
+        moment = datetime.fromtimestamp(now)
+        candidates = [
+            (domain, datetime.fromtimestamp(info["last"]), info["rate"])
+            for domain, info in state.items()
+            if info["due"] <= now
+        ]
+        for domain in plan(candidates, policy, checks_per_run, lambda domain: 1, moment):
+            info = state[domain]
+            change = _changed_between(truth[domain], info["last"], now)
+            info["rate"], interval = policy.observe(info["rate"], change, now - info["last"])
+            info["last"] = now
+            info["due"] = now + interval.total_seconds()
+            checks += 1
+            captured += change
+            wasted += change < WASTE_THRESHOLD
+        staleness.append(
+            sum(_changed_between(truth[domain], info["last"], now) for domain, info in state.items()) / len(state)
+        )
+        now += run_every
+
+    return {
+        "policy": policy.name,
+        "domains": len(truth),
+        "checks": checks,
+        "wasted": wasted,
+        "captured": captured,
+        "staleness": sum(staleness) / len(staleness) if staleness else 0.0,
+    }
+
+
+def compare_policies(check_log, policies, checks_per_run):
+    """Imprime a simulação de cada política lado a lado"""
+    print(f"\n=== Simulação ({checks_per_run} verificações por execução) ===")
+    print(f"{'Política':<12} {'Domínios':>9} {'Verif.':>7} {'Inúteis':>8} {'Mudança vista':>14} {'Defasagem':>10}")
+    results = []
+    for policy in policies:
+        result = simulate(check_log, policy, checks_per_run)
+        if result is None:
+            print("Log sem verificações suficientes para simular (são precisas duas por domínio)")
+            return []
+        results.append(result)
+        print(
+            f"{result['policy']:<12} {result['domains']:>9} {result['checks']:>7} {result['wasted']:>8} "
+            f"{result['captured']:>14.2f} {result['staleness']:>9.1%}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    from history_store import HistoryStore
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "domain_history.db"
+    per_run = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    store = HistoryStore(db_path)
+    compare_policies(store.check_log(), [FixedPolicy(), AdaptiveScheduler()], per_run)
+    store.close()
@@ -0,0 +1,97 @@
+"""
+Resolve seletores disputando todos os candidatos em paralelo e lembra o vencedor
+"""
+
+import asyncio
+import json
+import os
+
+from session_cache import atomic_write_json
+
+
+class SelectorCache:
+    """Seletor vencedor por página e campo, persistido em JSON"""
+
+    def __init__(self, path="selector_cache.json"):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._data = json.load(f)
+                except Exception as e:
+                    print(f"Cache de seletores inválido, ignorando: {str(e)}")
+        return self._data
+
+    def get(self, page_key, field):
+        return self._load().get(f"{page_key}:{field}")
+
+    def set(self, page_key, field, selector):
+        data = self._load()
+        key = f"{page_key}:{field}"
+        if data.get(key) != selector:
+            data[key] = selector
+            try:
+                atomic_write_json(self.path, data)
+            except Exception as e:
+                print(f"Erro ao salvar cache de seletores: {str(e)}")
+
+    def forget(self, page_key, field):
+        data = self._load()
+        if data.pop(f"{page_key}:{field}", None) is not None:
+            try:
+                atomic_write_json(self.path, data)
+            except Exception as e:
+                print(f"Erro ao salvar cache de seletores: {str(e)}")
+
+
+async def race_selectors(page, candidates, timeout=10000):
+    """Espera todos os candidatos ao mesmo tempo e retorna (seletor, elemento) do primeiro
+
+    Se vários aparecem juntos, vence o que vem antes na lista de candidatos.
+    """
+    tasks = {
+        asyncio.create_task(page.wait_for_selector(selector, timeout=timeout)): index
+        for index, selector in enumerate(candidates)
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            found = [
+                (tasks[task], task.result())
+                for task in done
+                if task.exception() is None and task.result() is not None
+            ]
+            if found:
+                index, handle = min(found, key=lambda item: item[0])
+                return candidates[index], handle
+        return None, None
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def resolve_selector(page, cache, page_key, field, candidates, timeout=10000, cached_timeout=3000):
+    """Tenta o seletor do cache primeiro; só disputa a lista completa se ele falhar"""
+    cached = cache.get(page_key, field)
+    if cached:
+        try:
+            handle = await page.wait_for_selector(cached, timeout=cached_timeout)
+            if handle:
+                print(f"Campo {field} encontrado com seletor do cache: {cached}")
+                return handle
+        except Exception:
+            print(f"Seletor do cache para {field} não encontrado: {cached}")
+        cache.forget(page_key, field)
+
+    selector, handle = await race_selectors(page, candidates, timeout=timeout)
+    if handle:
+        print(f"Campo {field} encontrado com seletor: {selector}")
+        cache.set(page_key, field, selector)
+    return handle
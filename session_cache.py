@@ -0,0 +1,79 @@
+"""
+Cache em disco do estado da sessão (cookies + localStorage) do Playwright
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+
+def atomic_write_json(path, data):
+    """Grava JSON num arquivo temporário e o move por cima do destino"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SessionCache:
+    """Guarda o storage_state com metadados de validade"""
+
+    def __init__(self, path="auth.json", max_age=timedelta(hours=12), cookie_domain="seopacktools"):
+        self.path = path
+        self.max_age = max_age
+        self.cookie_domain = cookie_domain
+
+    def load(self):
+        """Retorna o storage_state salvo, ou None se ausente, corrompido ou expirado"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            expires_at = datetime.fromisoformat(data["expires_at"])
+            state = data["storage_state"]
+        except Exception as e:
+            print(f"Cache de sessão inválido, ignorando: {str(e)}")
+            return None
+
+        if datetime.now() >= expires_at:
+            print(f"Cache de sessão expirado em {expires_at:%Y-%m-%d %H:%M:%S}")
+            return None
+        return state
+
+    def save(self, state):
+        """Salva o storage_state calculando a validade a partir dos cookies"""
+        now = datetime.now()
+        expires_at = now + self.max_age
+
+        # Um cookie de sessão que expira antes do limite encurta a validade do cache
+        for cookie in state.get("cookies", []):
+            if self.cookie_domain not in cookie.get("domain", ""):
+                continue
+            expires = cookie.get("expires", -1)
+            if expires and expires > 0:
+                expires_at = min(expires_at, datetime.fromtimestamp(expires))
+
+        atomic_write_json(self.path, {
+            "saved_at": now.isoformat(timespec="seconds"),
+            "expires_at": expires_at.isoformat(timespec="seconds"),
+            "storage_state": state,
+        })
+        return expires_at
+
+    def invalidate(self):
+        """Remove o cache (ex.: quando o servidor derrubou a sessão)"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,141 @@
+"""
+Divisão dos domínios entre contas/jobs por hashing de rendezvous e junção dos históricos depois
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+
+
+def _score(worker, domain):
+    digest = hashlib.blake2b(f"{worker}\0{domain}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_for(domain, workers):
+    """Worker do domínio: o de maior peso para o par (worker, domínio)
+
+    Com rendezvous hashing, incluir ou remover um worker só move os domínios
+    que iriam para ele (cerca de 1/N); os demais continuam onde estavam.
+    """
+    if not workers:
+        raise ValueError("Nenhum worker configurado")
+    return max(workers, key=lambda worker: _score(worker, domain))
+
+
+def assign_domains(domains, workers):
+    """Dicionário worker → lista de domínios, preservando a ordem original"""
+    shards = {worker: [] for worker in workers}
+    for domain in domains:
+        shards[shard_for(domain, workers)].append(domain)
+    return shards
+
+
+def accounts_from_config(config):
+    """Contas do config: SEOPACK_ACCOUNTS ou, sem ele, a conta única SEOPACK_LOGIN/SEOPACK_PASSWORD"""
+    accounts = config.get("SEOPACK_ACCOUNTS")
+    if accounts:
+        return {name: (account["login"], account["password"]) for name, account in accounts.items()}
+    return {"principal": (config["SEOPACK_LOGIN"], config["SEOPACK_PASSWORD"])}
+
+
+def shard_file(path, shard):
+    """domain_history.db → domain_history_<shard>.db"""
+    base, extension = os.path.splitext(path)
+    return f"{base}_{shard}{extension}"
+
+
+def seed_history(target_path, merged_path, domains):
+    """Traz do histórico combinado os domínios que chegaram a este shard e ele ainda não conhece"""
+    if not os.path.exists(merged_path) or not domains:
+        return 0
+    conn = sqlite3.connect(target_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS merged", (merged_path,))
+        conn.execute("CREATE TEMP TABLE shard_domains (domain TEXT PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO shard_domains (domain) VALUES (?)", ((d,) for d in domains))
+        with conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO main.history (domain, last_check, status, next_due, active, change_rate, interval)
+                SELECT h.domain, h.last_check, h.status, h.next_due, 1, h.change_rate, h.interval
+                FROM merged.history h JOIN shard_domains s ON s.domain = h.domain
+                """
+            )
+            seeded = cursor.rowcount
+            conn.execute(
+                """
+                INSERT INTO main.checks (domain, checked_at, change)
+                SELECT c.domain, c.checked_at, c.change
+                FROM merged.checks c JOIN shard_domains s ON s.domain = c.domain
+                WHERE NOT EXISTS (SELECT 1 FROM main.checks m WHERE m.domain = c.domain)
+                """
+            )
+        conn.execute("DETACH DATABASE merged")
+        return seeded
+    finally:
+        conn.close()
+
+
+def merge_histories(target_path, shard_paths):
+    """Combina os históricos dos shards: vale a verificação mais recente de cada domínio"""
+    from history_store import HistoryStore
+
+    # Garante o esquema completo no destino
+    HistoryStore(target_path).close()
+    conn = sqlite3.connect(target_path)
+    merged = 0
+    try:
+        for path in shard_paths:
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            with conn:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO main.history (domain, last_check, status, next_due, active, change_rate, interval)
+                    SELECT domain, last_check, status, next_due, active, change_rate, interval FROM shard.history
+                    WHERE true
+                    ON CONFLICT(domain) DO UPDATE SET
+                        last_check = excluded.last_check,
+                        status = excluded.status,
+                        next_due = excluded.next_due,
+                        active = excluded.active,
+                        change_rate = excluded.change_rate,
+                        interval = excluded.interval
+                    WHERE excluded.last_check IS NOT NULL
+                      AND (main.history.last_check IS NULL OR excluded.last_check > main.history.last_check)
+                    """
+                )
+                merged += cursor.rowcount
+                conn.execute(
+                    """
+                    INSERT INTO main.checks (domain, checked_at, change)
+                    SELECT domain, checked_at, change FROM shard.checks c
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM main.checks m WHERE m.domain = c.domain AND m.checked_at = c.checked_at
+                    )
+                    """
+                )
+            conn.execute("DETACH DATABASE shard")
+            print(f"{path} combinado em {target_path}")
+    finally:
+        conn.close()
+    return merged
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "merge":
+        target = sys.argv[2]
+        sources = [path for path in sys.argv[3:] if os.path.abspath(path) != os.path.abspath(target)]
+        count = merge_histories(target, sources)
+        print(f"{len(sources)} históricos combinados, {count} domínios atualizados")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "assign":
+        workers = sys.argv[3:] or ["principal"]
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            domains = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        for worker, shard in assign_domains(domains, workers).items():
+            print(f"{worker}: {len(shard)} domínios")
+    else:
+        print("Uso: python sharding.py merge <destino.db> <shard.db> [shard.db...]")
+        print("     python sharding.py assign <domains.txt> <worker> [worker...]")
+        sys.exit(1)
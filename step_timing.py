@@ -0,0 +1,42 @@
+"""
+Cronometragem das esperas de cada etapa do fluxo
+"""
+
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+
+class StepTimer:
+    """Acumula o tempo de relógio gasto em cada etapa nomeada"""
+
+    def __init__(self):
+        self._durations = defaultdict(list)
+        self._timeouts = defaultdict(int)
+
+    @asynccontextmanager
+    async def step(self, name):
+        """Mede o bloco; exceções de timeout também são contabilizadas"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if "timeout" in type(e).__name__.lower() or "timeout" in str(e).lower():
+                self._timeouts[name] += 1
+            raise
+        finally:
+            self._durations[name].append(time.monotonic() - started)
+
+    def report(self):
+        """Imprime quanto tempo cada espera realmente usou"""
+        if not self._durations:
+            return
+        print("\n=== Tempo por etapa ===")
+        print(f"{'Etapa':<32} {'N':>4} {'Total':>9} {'Média':>8} {'Máx':>8} {'Timeouts':>9}")
+        ordered = sorted(self._durations.items(), key=lambda item: sum(item[1]), reverse=True)
+        for name, values in ordered:
+            total = sum(values)
+            print(
+                f"{name:<32} {len(values):>4} {total:>8.1f}s {total / len(values):>7.2f}s "
+                f"{max(values):>7.2f}s {self._timeouts[name]:>9}"
+            )
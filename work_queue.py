@@ -0,0 +1,272 @@
+"""
+Fila persistente de domínios em SQLite, com lease, confirmação e novas tentativas
+
+Uso: python work_queue.py <fila.db> requeue <domínio> [domínio...]
+"""
+
+import asyncio
+import sqlite3
+import sys
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL UNIQUE,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    last_error TEXT,
+    updated_at REAL
+);
+"""
+
+# Colunas acrescentadas depois da primeira versão do banco
+MIGRATIONS = {
+    # Posição na ordem de enfileiramento; desempata jobs da mesma prioridade
+    "seq": "ALTER TABLE jobs ADD COLUMN seq INTEGER NOT NULL DEFAULT 0",
+}
+
+# Depois das migrações, pois usam as colunas novas
+INDEXES = """
+DROP INDEX IF EXISTS idx_jobs_ready;
+CREATE INDEX IF NOT EXISTS idx_jobs_order
+    ON jobs(priority DESC, seq) WHERE state IN ('pending', 'leased');
+"""
+
+# Estados: pending (aguardando), leased (com um worker), done (concluído), dead (esgotou tentativas).
+# Para pending, available_at é quando o job pode ser pego; para leased, quando o lease expira.
+
+
+class Job:
+    """Domínio emprestado a um worker até ack ou nack"""
+
+    def __init__(self, id, domain, attempts, token):
+        self.id = id
+        self.domain = domain
+        self.attempts = attempts
+        self.token = token
+
+    def __repr__(self):
+        return self.domain
+
+
+class WorkQueue:
+    """Fila compartilhável entre processos pelo mesmo arquivo SQLite"""
+
+    def __init__(self, path="domain_queue.db", lease_seconds=900, max_attempts=3, retry_delay=60, dead_cooldown=7 * 86400):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Um job morto só volta a ser enfileirado depois disso, ou com requeue
+        self.dead_cooldown = dead_cooldown
+        # isolation_level=None: as transações são abertas explicitamente com BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(statement)
+        self.conn.executescript(INDEXES)
+
+    def _transaction(self):
+        return _ImmediateTransaction(self.conn)
+
+    def enqueue(self, domain, priority=0):
+        self.enqueue_many([domain], priority)
+
+    def enqueue_many(self, domains, priority=0, chunk_size=10000):
+        """Enfileira domínios; os que já estão pendentes só ganham prioridade maior
+
+        Os concluídos voltam para a fila; os mortos só depois de dead_cooldown.
+        A ordem da lista é mantida na mesma prioridade pela coluna seq, que
+        continua a numeração dos enfileirados antes.
+        """
+        now = time.time()
+        first_seq = self.conn.execute("SELECT coalesce(max(seq), 0) + 1 FROM jobs").fetchone()[0]
+        chunk = []
+        for index, domain in enumerate(domains):
+            chunk.append((domain, priority, first_seq + index, now, now - self.dead_cooldown))
+            if len(chunk) >= chunk_size:
+                self._insert(chunk)
+                chunk = []
+        if chunk:
+            self._insert(chunk)
+
+    def _insert(self, rows):
+        # ?5: jobs mortos antes disso já cumpriram a espera e podem voltar
+        with self._transaction():
+            self.conn.executemany(
+                """
+                INSERT INTO jobs (domain, priority, seq, available_at, updated_at) VALUES (?1, ?2, ?3, ?4, ?4)
+                ON CONFLICT(domain) DO UPDATE SET
+                    priority = CASE WHEN state IN ('pending', 'leased')
+                                    THEN max(priority, excluded.priority) ELSE excluded.priority END,
+                    attempts = CASE WHEN state IN ('done', 'dead') THEN 0 ELSE attempts END,
+                    -- Sem tentativas ainda, o job assume a posição da nova lista; os em espera mantêm a sua
+                    seq = CASE WHEN state IN ('done', 'dead') OR (state = 'pending' AND attempts = 0)
+                               THEN excluded.seq ELSE seq END,
+                    available_at = CASE WHEN state IN ('done', 'dead') OR (state = 'pending' AND attempts = 0)
+                                        THEN excluded.available_at ELSE available_at END,
+                    state = CASE WHEN state IN ('done', 'dead') THEN 'pending' ELSE state END,
+                    updated_at = excluded.updated_at
+                WHERE state != 'dead' OR updated_at <= ?5
+                """,
+                rows,
+            )
+
+    def requeue(self, domains):
+        """Devolve à fila domínios mortos (ou concluídos) na hora, com as tentativas zeradas"""
+        now = time.time()
+        with self._transaction():
+            cursor = self.conn.executemany(
+                "UPDATE jobs SET state = 'pending', attempts = 0, available_at = ?, lease_token = NULL, "
+                "updated_at = ? WHERE domain = ? AND state IN ('done', 'dead')",
+                [(now, now, domain) for domain in domains],
+            )
+        return cursor.rowcount
+
+    def import_file(self, path="domains.txt", priority=0):
+        """Importa um arquivo com um domínio por linha, em lotes"""
+        with open(path, "r", encoding="utf-8") as f:
+            domains = (line.strip() for line in f)
+            self.enqueue_many((d for d in domains if d and not d.startswith("#")), priority)
+
+    def lease(self, limit=1):
+        """Empresta até limit jobs prontos (pendentes ou com lease expirado)"""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._transaction():
+            rows = self.conn.execute(
+                """
+                SELECT id, domain, attempts FROM jobs
+                WHERE state IN ('pending', 'leased') AND available_at <= ?
+                ORDER BY priority DESC, seq, id
+                LIMIT ?
+                """,
+                (now, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET state = 'leased', lease_token = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                [(token, now + self.lease_seconds, now, row[0]) for row in rows],
+            )
+        return [Job(row[0], row[1], row[2], token) for row in rows]
+
+    def next_available(self):
+        """Quando o próximo job pendente fica pronto ou o próximo lease expira; None sem jobs em aberto"""
+        return self.conn.execute(
+            "SELECT min(available_at) FROM jobs WHERE state IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def ack(self, job):
+        """Marca o job como concluído, se o lease ainda for deste worker"""
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = 'done', lease_token = NULL, last_error = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_token = ?",
+                (time.time(), job.id, job.token),
+            )
+        return cursor.rowcount == 1
+
+    def nack(self, job, error=None):
+        """Devolve o job com espera exponencial, ou o marca como morto após max_attempts"""
+        attempts = job.attempts + 1
+        now = time.time()
+        state = "dead" if attempts >= self.max_attempts else "pending"
+        available_at = now + self.retry_delay * (2 ** (attempts - 1))
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, available_at = ?, lease_token = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ? AND lease_token = ?",
+                (state, attempts, available_at, error, now, job.id, job.token),
+            )
+        return cursor.rowcount == 1
+
+    def extend_lease(self, job):
+        """Renova o lease de um job que ainda está sendo processado"""
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET available_at = ? WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, job.id, job.token),
+            )
+        return cursor.rowcount == 1
+
+    def purge_done(self, older_than_seconds=30 * 86400):
+        """Remove jobs concluídos antigos para a fila não crescer sem limite"""
+        with self._transaction():
+            cursor = self.conn.execute(
+                "DELETE FROM jobs WHERE state = 'done' AND updated_at < ?",
+                (time.time() - older_than_seconds,),
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT state, count(*) FROM jobs GROUP BY state"))
+
+    def close(self):
+        self.conn.close()
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE garante que só um processo pegue cada job"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
+
+
+class LeasedSource:
+    """Adapta a fila persistente ao pool de workers (take/finish)
+
+    Sem job pronto, espera o próximo (um nack em espera, ou um domínio ainda
+    com outro worker) enquanto ele couber em time_left(); sem time_left,
+    encerra na hora.
+    """
+
+    def __init__(self, queue, time_left=None, poll_interval=5):
+        self.queue = queue
+        self.time_left = time_left
+        self.poll_interval = poll_interval
+
+    async def take(self):
+        while True:
+            jobs = self.queue.lease(1)
+            if jobs:
+                return jobs[0]
+            next_at = self.queue.next_available()
+            if next_at is None or self.time_left is None:
+                return None
+            wait = next_at - time.time()
+            if wait > self.time_left():
+                return None
+            # Em intervalos curtos: um nack de outro worker pode liberar um job antes
+            await asyncio.sleep(min(max(wait, 0), self.poll_interval))
+
+    async def finish(self, job, ok):
+        if ok:
+            self.queue.ack(job)
+        else:
+            self.queue.nack(job, "falha no processamento")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[2] == "requeue":
+        queue = WorkQueue(sys.argv[1])
+        print(f"{queue.requeue(sys.argv[3:])} domínios devolvidos à fila")
+        queue.close()
+    else:
+        print(__doc__.split("\n", 3)[3])
+        sys.exit(1)
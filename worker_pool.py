@@ -0,0 +1,126 @@
+"""
+Pool de workers assíncronos com limite de taxa global
+"""
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Garante um intervalo mínimo global entre o início de duas requisições"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        """Aguarda até o próximo horário livre, compartilhado entre todos os workers"""
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class WorkerStats:
+    """Contadores de um worker do pool"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def per_minute(self):
+        """Domínios concluídos por minuto de relógio"""
+        if self.elapsed <= 0:
+            return 0.0
+        return (self.processed + self.failed) * 60 / self.elapsed
+
+
+class QueueSource:
+    """Fonte de itens em memória, consumida uma única vez"""
+
+    def __init__(self, items):
+        self._queue = asyncio.Queue()
+        for item in items:
+            self._queue.put_nowait(item)
+
+    async def take(self):
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    async def finish(self, item, ok):
+        self._queue.task_done()
+
+
+async def _worker(resource, stats, source, handler, limiter):
+    """Consome itens da fonte até ela esvaziar"""
+    while True:
+        item = await source.take()
+        if item is None:
+            break
+
+        await limiter.wait()
+        started = time.monotonic()
+        try:
+            ok = await handler(resource, item)
+        except Exception as e:
+            # O handler já deveria isolar os erros; isto só impede que o worker morra
+            print(f"[worker {stats.worker_id}] Erro inesperado em {item}: {str(e)}")
+            ok = False
+        finally:
+            stats.busy_time += time.monotonic() - started
+
+        await source.finish(item, ok)
+        if ok:
+            stats.processed += 1
+        else:
+            stats.failed += 1
+
+    stats.finished_at = time.monotonic()
+
+
+async def run_worker_pool(resources, items, handler, limiter):
+    """Processa os itens com um worker por recurso (ex.: uma página por worker)
+
+    items pode ser uma lista ou uma fonte com take()/finish(item, ok), como a
+    fila persistente. O handler recebe (recurso, item) e retorna True em caso
+    de sucesso.
+    """
+    source = items if hasattr(items, "take") else QueueSource(items)
+
+    stats = [WorkerStats(i + 1) for i in range(len(resources))]
+    await asyncio.gather(*[
+        _worker(resource, worker_stats, source, handler, limiter)
+        for resource, worker_stats in zip(resources, stats)
+    ])
+    return stats
+
+
+def print_worker_report(stats):
+    """Imprime a vazão de cada worker"""
+    print("\n=== Vazão por worker ===")
+    for s in stats:
+        occupancy = (s.busy_time / s.elapsed * 100) if s.elapsed > 0 else 0.0
+        print(
+            f"Worker {s.worker_id}: {s.processed} ok, {s.failed} com erro, "
+            f"{s.per_minute:.2f} domínios/min, ocupação {occupancy:.0f}%"
+        )
+    total = sum(s.processed + s.failed for s in stats)
+    elapsed = max((s.elapsed for s in stats), default=0)
+    if elapsed > 0:
+        print(f"Total: {total} domínios em {elapsed:.1f}s ({total * 60 / elapsed:.2f} domínios/min)")